@@ -1,54 +1,506 @@
 #----------------------------------------------------------------------------#
 # Imports
 #----------------------------------------------------------------------------#
-from datetime import datetime
+from datetime import date, datetime, timedelta
+import hashlib
 import json
-import dateutil.parser
+import mimetypes
+import os
+import time
+from functools import lru_cache
 
-import babel
-from flask import render_template, request, Response, flash, redirect, url_for, jsonify, abort
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
+import click
+from flask import (Flask, Blueprint, render_template, request, Response, flash, redirect, url_for, jsonify,
+                   abort, session, g, current_app, has_request_context, before_render_template,
+                   template_rendered, stream_with_context, make_response, send_from_directory)
+from flask.blueprints import BlueprintSetupState
+from flask.cli import AppGroup, with_appcontext
+from sqlalchemy import String, cast, event, func, literal_column, or_, select, union_all
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import configure_mappers
+from sqlalchemy.dialects.postgresql import ARRAY, array
+from werkzeug.http import is_resource_modified
 
 import logging
 from logging import Formatter, FileHandler
 
-from forms import *
-from models import setup_app, setup_db, setup_venue_model, setup_artist_model, setup_show_model
+from assets import Assets
+from bulk_import import ImportReport, detect_format, read_rows, resolve_foreign_key, run_import
+from cache import PageCache
+from changes import ChangeTracker
+from dbpool import pool_stats
+from export import EXPORT_FORMATS, stream_export, to_json_value
+from metrics import COUNT_BUCKETS, CallbackMetric, Counter, Histogram, Registry
+from choices import genre_choices, state_choices
+from models import (db, Venue, Artist, Show, VenueSummary, ArtistSummary, TableVersion,
+                    DEFAULT_SHOW_DURATION_MINUTES, MAX_SHOW_DURATION_MINUTES)
+from pagination import encode_cursor, keyset_query, keyset_result
+from replicas import ReplicaRouter
+from scheduling import ShowScheduler, Slot
+from summaries import ShowSummaries
 
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
-app = setup_app()
-db = setup_db(app)
-migrate = Migrate(app, db)
 
-#----------------------------------------------------------------------------#
-# Models.
-#----------------------------------------------------------------------------#
-Venue = setup_venue_model(db)
-Artist = setup_artist_model(db)
-Show = setup_show_model(db)
+class ViewsSetupState(BlueprintSetupState):
+  # Adds each rule under the view's own endpoint name, without the
+  # blueprint's name in front, which the templates, redirects and request
+  # metrics use. URL prefixes and subdomains are not needed and not applied.
+  def add_url_rule(self, rule, endpoint=None, view_func=None, **options):
+    self.app.add_url_rule(rule, endpoint or view_func.__name__, view_func, **options)
+
+class Views(Blueprint):
+  def make_setup_state(self, app, options, first_registration=False):
+    return ViewsSetupState(self, app, options, first_registration)
+
+# The views of this module, registered on every app create_app() builds.
+views = Views('views', __name__)
+
+def create_app(config='config'):
+  """Build the Flask app with the settings of `config`, a module name or object.
+
+  Importing this module only declares the models, views and commands;
+  nothing connects to the database until a request or command needs it.
+  """
+  app = Flask(__name__)
+  app.config.from_object(config)
+  db.init_app(app)
+  replicas.init_app(app)
+  page_cache.init_app(app)
+  assets.init_app(app)
+  # Alembic is only needed by the `flask db` commands.
+  if click.get_current_context(silent=True) is not None:
+    from flask_migrate import Migrate
+    Migrate(app, db)
+
+  app.jinja_env.filters['datetime'] = format_datetime
+  app.register_blueprint(views)
+  app.add_url_rule(app.static_url_path + '/dist/<path:filename>', 'asset_bundle', asset_bundle)
+  app.register_error_handler(404, not_found_error)
+  app.register_error_handler(500, server_error)
+
+  app.before_request(start_request_metrics)
+  app.after_request(record_request_metrics)
+  before_render_template.connect(start_template_timer, app)
+  template_rendered.connect(record_template_render, app)
+
+  app.cli.add_command(summaries_cli)
+  app.cli.add_command(assets_cli)
+  app.cli.add_command(import_data)
+  configure_logging(app)
+  return app
+
+def preload(app):
+  """Do the work that is otherwise deferred to the first requests.
+
+  Meant for a server's master process before it forks its workers, which
+  then share the imported modules, the configured mappers and the compiled
+  templates instead of each building their own.
+  """
+  parse_datetime('2000-01-01')
+  for format in DATETIME_FORMATS:
+    datetime_pattern(format)
+  datetime_locale()
+  form_class('VenueForm')
+  configure_mappers()
+  for name in app.jinja_env.list_templates(extensions=['html']):
+    app.jinja_env.get_template(name)
+
+def dispose_engines(app):
+  """Close the pooled connections of the primary and every replica engine.
+
+  A forking server calls this in its master before each fork and in the
+  worker right after, so a worker never inherits, and never closes, a
+  socket that another process is using.
+  """
+  with app.app_context():
+    for bind in [None] + list(app.config.get('SQLALCHEMY_BINDS') or {}):
+      db.get_engine(app, bind=bind).dispose()
+
+changes = ChangeTracker(db, TableVersion, [Venue, Artist, Show])
+summaries = ShowSummaries(db, Show, VenueSummary, ArtistSummary, changes)
+scheduler = ShowScheduler(db, Venue, Artist, MAX_SHOW_DURATION_MINUTES)
+replicas = ReplicaRouter(db)
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
+# Babel is imported and each pattern parsed on first use; the 'full' and
+# 'medium' names map to our own formats.
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+}
+
+@lru_cache(maxsize=64)
+def datetime_pattern(format):
+  import babel.dates
+  return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format))
+
+@lru_cache(maxsize=1)
+def datetime_locale():
+  import babel
+  return babel.Locale.parse('en')
+
+@lru_cache(maxsize=4096)
+def _format_datetime(date, format):
+  return datetime_pattern(format).apply(date, datetime_locale())
+
+def parse_datetime(value):
+  # dateutil is likewise imported on first use.
+  import dateutil.parser
+  return dateutil.parser.parse(value)
+
+def form_class(name):
+  # Flask-WTF imports Babel too, so the forms are loaded when first needed.
+  import forms
+  return getattr(forms, name)
+
 def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format, locale='en')
+  # Views pass datetimes; strings are still accepted and parsed.
+  if isinstance(value, str):
+    value = parse_datetime(value)
+  return _format_datetime(value, format)
+
+#----------------------------------------------------------------------------#
+# Static assets.
+#----------------------------------------------------------------------------#
+
+# Pages load bundles built by `flask assets build`, or the source files
+# when nothing has been built.
+assets = Assets()
+
+# Built bundles are named after their content, so they never change.
+ASSET_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+def asset_bundle(filename):
+  path, encoding = assets.encoded_file(filename, request.accept_encodings)
+  if path is None:
+    abort(404)
+  response = send_from_directory(assets.dist, path, mimetype=mimetypes.guess_type(filename)[0])
+  if encoding:
+    response.content_encoding = encoding
+  response.vary.add('Accept-Encoding')
+  response.headers['Cache-Control'] = ASSET_CACHE_CONTROL
+  return response
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+def like_pattern(term):
+  # Escape LIKE wildcards so user input is matched literally.
+  escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+  return '%' + escaped + '%'
+
+def matching_genres(term):
+  term = term.strip().lower()
+  return [genre for genre, _ in genre_choices if term and genre.lower() == term]
+
+def genre_array(genres):
+  # Genre columns are varchar[]; cast literals so `@>` can use their GIN index.
+  return cast(array(genres), ARRAY(String(120)))
+
+def search_query(model, summary, summary_key, search_term, page, fields, extra_matches=()):
+  # Trigram-indexed ILIKE match on the given fields, ranked by similarity.
+  # Upcoming show counts (from the summary table) and the total number of
+  # matches come back in the same query, so a page costs one round trip.
+  per_page = current_app.config['SEARCH_RESULTS_PER_PAGE']
+  pattern = like_pattern(search_term)
+  matches = [field.ilike(pattern, escape='\\') for field in fields] + list(extra_matches)
+  rank = func.greatest(*[func.similarity(field, search_term) for field in fields])
+  return db.session.query(
+    model.id, model.name, func.coalesce(summary.upcoming_shows_count, 0), func.count().over()
+  ).outerjoin(summary, summary_key == model.id).filter(or_(*matches)).order_by(rank.desc(), model.name, model.id).limit(
+    per_page).offset((page - 1) * per_page)
+
+def search_results(rows, page):
+  total = rows[0][3] if rows else 0
+  return {
+    "count": total,
+    "page": page,
+    "has_next": page * current_app.config['SEARCH_RESULTS_PER_PAGE'] < total,
+    "data": [{"id": row[0], "name": row[1], "num_upcoming_shows": row[2]} for row in rows]
+  }
+
+def venue_search_query(search_term, page):
+  matches = [Venue.genres.contains(genre_array([genre])) for genre in matching_genres(search_term)]
+  return search_query(Venue, VenueSummary, VenueSummary.venue_id, search_term, page,
+                      [Venue.name, Venue.city, Venue.state], matches)
+
+def artist_search_query(search_term, page):
+  matches = [Artist.genres.contains(genre_array([genre])) for genre in matching_genres(search_term)]
+  return search_query(Artist, ArtistSummary, ArtistSummary.artist_id, search_term, page,
+                      [Artist.name, Artist.city, Artist.state], matches)
+
+def search_form():
+  # The search term and the page (at least 1) of a search form submission.
+  return request.form.get('search_term', ''), max(request.form.get('page', 1, type=int), 1)
+
+#----------------------------------------------------------------------------#
+# Listings.
+#----------------------------------------------------------------------------#
+
+def page_args():
+  return request.args.get('after'), request.args.get('before')
+
+def listing_page(rows, keys, after, before):
+  return keyset_result(rows, keys, current_app.config['LISTING_PAGE_SIZE'], after, before)
 
-app.jinja_env.filters['datetime'] = format_datetime
+#----------------------------------------------------------------------------#
+# Detail page shows.
+#----------------------------------------------------------------------------#
+
+PAST_SHOW_KEYS = [Show.start_time, Show.show_id]
+
+def shows_with(show_key, entity_id, other, other_key, prefix):
+  # Shows of a venue or artist with the name and image of the other side.
+  return db.session.query(
+    Show.show_id, Show.start_time, other.id.label(prefix + '_id'),
+    other.name.label(prefix + '_name'), other.image_link.label(prefix + '_image_link')
+  ).join(other, other_key == other.id).filter(show_key == entity_id)
+
+def show_data(row, prefix):
+  return {prefix + "_id": getattr(row, prefix + '_id'),
+          prefix + "_name": getattr(row, prefix + '_name'),
+          prefix + "_image_link": getattr(row, prefix + '_image_link'),
+          "start_time": row.start_time}
+
+def entity_query(model, summary, summary_key, entity_id):
+  # A venue or artist row with its total number of shows.
+  return db.session.query(
+    *model.__table__.columns,
+    func.coalesce(summary.upcoming_shows_count + summary.past_shows_count, 0).label('num_shows')
+  ).outerjoin(summary, summary_key == model.id).filter(model.id == entity_id)
+
+def detail_shows_query(show_key, entity_id, other, other_key, prefix, now):
+  # Every upcoming show and the DETAIL_PAST_SHOWS most recent past ones in
+  # one UNION ALL query, plus one more past show if there is one, which
+  # tells detail_shows() whether to offer the next page.
+  query = shows_with(show_key, entity_id, other, other_key, prefix)
+  recent_past = query.filter(Show.start_time <= now).order_by(
+    Show.start_time.desc(), Show.show_id.desc()).limit(current_app.config['DETAIL_PAST_SHOWS'] + 1)
+  return union_all(query.filter(Show.start_time > now).statement, recent_past.statement)
+
+def detail_shows(rows, now, prefix):
+  # Split the rows of detail_shows_query() in a single pass. Older past
+  # shows are loaded page by page from the cursor returned last, which is
+  # None when the page already lists every past show.
+  upcoming, past = [], []
+  for row in rows:
+    (upcoming if row.start_time > now else past).append(row)
+  upcoming.sort(key=lambda row: (row.start_time, row.show_id))
+  past.sort(key=lambda row: (row.start_time, row.show_id), reverse=True)
+  cursor = None
+  if len(past) > current_app.config['DETAIL_PAST_SHOWS']:
+    past = past[:current_app.config['DETAIL_PAST_SHOWS']]
+    cursor = encode_cursor(PAST_SHOW_KEYS, past[-1])
+  return ([show_data(row, prefix) for row in upcoming],
+          [show_data(row, prefix) for row in past], cursor)
+
+def past_shows_count(num_shows, upcoming, past, cursor):
+  # num_shows comes from the summary tables, which may lag behind the shows
+  # just read or have no row at all (num_shows is then 0). The shows read
+  # bound the count: exactly those listed when there is no further page,
+  # and at least one more when there is.
+  if cursor is None:
+    return len(past)
+  return max(num_shows - len(upcoming), len(past) + 1)
+
+def past_shows_query(show_key, entity_id, other, other_key, prefix, before):
+  # The next older page of past shows before the `before` cursor.
+  if not before:
+    abort(400)
+  query = shows_with(show_key, entity_id, other, other_key, prefix).filter(
+    Show.start_time <= datetime.now())
+  return keyset_query(query, PAST_SHOW_KEYS, current_app.config['DETAIL_PAST_SHOWS'], before=before)
+
+def past_shows_page(rows, prefix, before):
+  # The page newest first, and the cursor of the page after it.
+  page = keyset_result(rows, PAST_SHOW_KEYS, current_app.config['DETAIL_PAST_SHOWS'], before=before)
+  return [show_data(row, prefix) for row in reversed(page.items)], page.prev_cursor
+
+def render_past_shows(fragment, back_label, back, **context):
+  # The "Load more" script swaps the bare fragment into the detail page;
+  # following the link without JavaScript gets it wrapped in a full page.
+  if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+    return render_template(fragment, **context)
+  return render_template('pages/past_shows.html', fragment=fragment, back_label=back_label,
+                         back=back, **context)
+
+#----------------------------------------------------------------------------#
+# Page cache.
+#----------------------------------------------------------------------------#
+
+page_cache = PageCache()
+
+def next_start_time(shows):
+  return min((show['start_time'] for show in shows), default=None)
+
+def cache_version():
+  # The data version conditional_response() built the ETag from. Entries
+  # are stored with it, so a write made by another worker or by the CLI,
+  # which this process's invalidate_*() calls never see, turns them into
+  # misses instead of serving the old body under the new ETag.
+  return g.get('data_version')
+
+def cached_page(kind, entity_id, render):
+  # `render` returns the page and the start time of its next upcoming show,
+  # after which the page would list that show under the wrong heading.
+  # Pages carrying flashed messages are rendered fresh and never stored.
+  if '_flashes' in session:
+    return render()[0]
+  key = (kind, entity_id, 'html')
+  version = cache_version()
+  page = page_cache.get(key, version)
+  if page is None:
+    page, expires_at = render()
+    if replicas.cacheable():
+      page_cache.set(key, page, expires_at, version)
+  return page
+
+def invalidate_venue(venue_id):
+  # Artist pages show the name and image of every venue they play at.
+  page_cache.invalidate('venue', venue_id)
+  page_cache.invalidate('artist')
+  page_cache.invalidate('shows')
+
+def invalidate_artist(artist_id):
+  # Venue pages show the name and image of every artist playing there.
+  page_cache.invalidate('artist', artist_id)
+  page_cache.invalidate('venue')
+  page_cache.invalidate('shows')
+
+def cached_json(kind, entity_id, variant, build):
+  # `build` returns the data and an optional expiry like `render` above.
+  key = (kind, entity_id, variant)
+  version = cache_version()
+  body = page_cache.get(key, version)
+  if body is None:
+    data, expires_at = build()
+    body = json.dumps(data, default=to_json_value)
+    if replicas.cacheable():
+      page_cache.set(key, body, expires_at, version)
+  return Response(body, mimetype='application/json')
+
+#----------------------------------------------------------------------------#
+# Conditional requests.
+#----------------------------------------------------------------------------#
+
+ALL_TABLES = [Venue.__tablename__, Artist.__tablename__, Show.__tablename__]
+
+def last_show_started():
+  # Pages split shows into upcoming and past, so they also change without
+  # any write whenever a show starts.
+  return select([func.max(Show.start_time)]).where(
+    Show.start_time <= datetime.now()).as_scalar()
+
+def page_etag(full_path, version, vary_value=None):
+  # Shared with async_app, so both serving modes give a page the same ETag.
+  key = full_path + '|' + version
+  if vary_value is not None:
+    key += '|' + vary_value
+  return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+def conditional_response(tables, render, vary=None):
+  # Answer 304 when none of the tables the page is built from has been
+  # written to and no show has started since the client's copy; only then
+  # does `render` run. Pages carrying flashed messages are always rendered.
+  # A page that also depends on the `vary` request header gets a separate
+  # ETag for each value of it.
+  if '_flashes' in session:
+    response = make_response(render())
+    if vary:
+      response.vary.add(vary)
+    return response
+  version, last_modified = changes.validator(tables, last_show_started())
+  g.data_version = version
+  etag = page_etag(request.full_path, version,
+                   request.headers.get(vary, '') if vary else None)
+  if is_resource_modified(request.environ, etag, last_modified=last_modified):
+    response = make_response(render())
+  else:
+    response = Response(status=304)
+  response.set_etag(etag)
+  response.last_modified = last_modified
+  response.cache_control.no_cache = True
+  if vary:
+    response.vary.add(vary)
+  return response
+
+#----------------------------------------------------------------------------#
+# Metrics.
+#----------------------------------------------------------------------------#
+
+metrics = Registry()
+request_duration = metrics.register(Histogram(
+  'fyyur_request_duration_seconds', 'Time spent handling a request.', ['endpoint']))
+requests_total = metrics.register(Counter(
+  'fyyur_requests_total', 'Requests handled, by status code.', ['endpoint', 'method', 'status']))
+request_sql_statements = metrics.register(Histogram(
+  'fyyur_request_sql_statements', 'SQL statements executed per request.', ['endpoint'],
+  COUNT_BUCKETS))
+request_db_duration = metrics.register(Histogram(
+  'fyyur_request_db_seconds', 'Time spent executing SQL per request.', ['endpoint']))
+template_render_duration = metrics.register(Histogram(
+  'fyyur_template_render_seconds', 'Time spent rendering a template.', ['template']))
+for name, help, read, kind in [
+  ('fyyur_page_cache_hits_total', 'Page cache hits.',
+   lambda: page_cache.stats()['hits'], 'counter'),
+  ('fyyur_page_cache_misses_total', 'Page cache misses.',
+   lambda: page_cache.stats()['misses'], 'counter'),
+  ('fyyur_page_cache_entries', 'Pages currently cached.',
+   lambda: page_cache.stats()['entries'], 'gauge'),
+  ('fyyur_db_pool_checked_out', 'Connections checked out of the pool.',
+   lambda: pool_stats(db.engine).get('checked_out', 0), 'gauge'),
+  ('fyyur_db_pool_overflow', 'Overflow connections open beyond the pool size.',
+   lambda: pool_stats(db.engine).get('overflow', 0), 'gauge'),
+  ('fyyur_db_pool_checkouts_total', 'Connection checkouts.',
+   lambda: pool_stats(db.engine).get('checkouts', 0), 'counter'),
+  ('fyyur_db_pool_timeouts_total', 'Checkouts that timed out waiting for a connection.',
+   lambda: pool_stats(db.engine).get('timeouts', 0), 'counter'),
+  ('fyyur_db_pool_wait_seconds_total', 'Time spent obtaining connections.',
+   lambda: pool_stats(db.engine).get('wait_seconds_total', 0), 'counter'),
+]:
+  metrics.register(CallbackMetric(name, help, read, type=kind))
+
+def start_request_metrics():
+  g.request_started = time.perf_counter()
+  g.sql_statements = 0
+  g.sql_seconds = 0.0
+
+def record_request_metrics(response):
+  if 'request_started' in g:
+    endpoint = request.endpoint or 'none'
+    request_duration.observe(time.perf_counter() - g.request_started, endpoint)
+    request_sql_statements.observe(g.sql_statements, endpoint)
+    request_db_duration.observe(g.sql_seconds, endpoint)
+    requests_total.inc(endpoint, request.method, response.status_code)
+  return response
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+  conn.info['statement_started'] = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def record_statement(conn, cursor, statement, parameters, context, executemany):
+  if has_request_context() and 'sql_statements' in g:
+    g.sql_statements += 1
+    g.sql_seconds += time.perf_counter() - conn.info.pop('statement_started')
+
+def start_template_timer(sender, template, context, **extra):
+  g.template_started = time.perf_counter()
+
+def record_template_render(sender, template, context, **extra):
+  template_render_duration.observe(time.perf_counter() - g.template_started, template.name)
 
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
-@app.route('/')
+@views.route('/')
 def index():
   return render_template('pages/home.html')
 
@@ -56,102 +508,64 @@ def index():
 #  Venues
 #  ----------------------------------------------------------------
 
-@app.route('/venues')
+@views.route('/venues')
 def venues():
-  unique_cities = []
-  unique_states = []
-  area = {}
-  data = []
-  venues = Venue.query.all()
+  return conditional_response([Venue.__tablename__, Show.__tablename__], render_venues)
+
+VENUE_LISTING_KEYS = [Venue.name, Venue.id]
+
+def venue_listing_query(after, before):
+  # A page of venues with their number of upcoming shows from the summary table.
+  query = db.session.query(
+    Venue.city, Venue.state, Venue.id, Venue.name,
+    func.coalesce(VenueSummary.upcoming_shows_count, 0)
+  ).outerjoin(VenueSummary, VenueSummary.venue_id == Venue.id)
+  return keyset_query(query, VENUE_LISTING_KEYS, current_app.config['LISTING_PAGE_SIZE'], after, before)
+
+def venue_areas(rows):
   # Group the venues into cities and states.
-  for venue in venues:
-    num_upcoming_shows = 0
-    if (venue.city not in unique_cities) & (venue.city not in unique_states):
-      unique_cities.append(venue.city)
-      unique_states.append(venue.state)
-      for show in venue.show:
-        if show.start_time > datetime.now():
-          num_upcoming_shows += 1
-      area[venue.city + ', ' + venue.state] = [{"id": venue.id, 
-                                                "name": venue.name,
-                                                "num_upcoming_shows": num_upcoming_shows}]
-    else:
-      area[venue.city + ', ' + venue.state].append({"id": venue.id, 
-                                                    "name": venue.name,
-                                                    "num_upcoming_shows": num_upcoming_shows})
-  for key in area:
-    data.append({"city": key[:-4],
-                 "state": key[-2:],
-                 "venues": area[key]})
-  return render_template('pages/venues.html', areas=data)
-
-@app.route('/venues/search', methods=['POST'])
+  areas = {}
+  for city, state, venue_id, name, num_upcoming_shows in rows:
+    areas.setdefault((city, state), []).append({"id": venue_id,
+                                                "name": name,
+                                                "num_upcoming_shows": num_upcoming_shows})
+  return [{"city": city, "state": state, "venues": venues}
+          for (city, state), venues in areas.items()]
+
+def render_venues():
+  after, before = page_args()
+  page = listing_page(venue_listing_query(after, before).all(), VENUE_LISTING_KEYS, after, before)
+  return render_template('pages/venues.html', areas=venue_areas(page.items), page=page)
+
+@views.route('/venues/search', methods=['POST'])
 def search_venues():
-  data = []
-  search_term = request.form.get('search_term')
-  # Case-insensitive search terms
-  results = Venue.query.filter(Venue.name.ilike("%" + search_term + "%")).all()
-  # Count the number of upcoming shows for each venue returned
-  for result in results:
-    num_upcoming_shows = 0
-    for show in result.show:
-      if show.start_time > datetime.now():
-        num_upcoming_shows += 1
-    data.append({"id": result.id, "name": result.name, "num_upcoming_shows": num_upcoming_shows})
-  response = {
-    "count": len(results),
-    "data": data
-  }
+  search_term, page = search_form()
+  response = search_results(venue_search_query(search_term, page).all(), page)
   return render_template('pages/search_venues.html', results=response, 
-    search_term=request.form.get('search_term', ''))
+    search_term=search_term)
 
-@app.route('/venues/<int:venue_id>')
+@views.route('/venues/<int:venue_id>')
 def show_venue(venue_id):
-  venue = Venue.query.get(venue_id)
+  return conditional_response(
+    ALL_TABLES, lambda: cached_page('venue', venue_id, lambda: render_venue(venue_id)))
+
+def render_venue(venue_id):
+  data = venue_details(venue_id)
+  return (render_template('pages/show_venue.html', venue=data),
+          next_start_time(data['upcoming_shows']))
+
+def venue_details(venue_id):
+  now = datetime.now()
+  venue = entity_query(Venue, VenueSummary, VenueSummary.venue_id, venue_id).first()
+  if venue is None:
+    abort(404)
+  rows = db.session.execute(
+    detail_shows_query(Show.venue_id, venue_id, Artist, Show.artist_id, 'artist', now))
+  return venue_data(venue, detail_shows(rows, now, 'artist'))
 
-  upcoming_shows = []
-  past_shows = []
-
-  # Filter Show table by artist_id and join its filtered version with Venue table
-  upcoming_shows_query = Show.query.filter_by(venue_id=venue_id).filter(
-    Show.start_time > datetime.now()).join(Artist, Show.artist_id == Artist.id).add_columns(
-      Artist.id, Artist.name, Artist.image_link, Show.start_time).all()
-  past_shows_query = Show.query.filter_by(venue_id=venue_id).filter(
-    Show.start_time <= datetime.now()).join(Artist, Show.artist_id == Artist.id).add_columns(
-      Artist.id, Artist.name, Artist.image_link, Show.start_time).all()
-
-  for row in upcoming_shows_query:
-    upcoming_shows.append({
-      "artist_id": row[1],
-      "artist_name": row[2],
-      "artist_image_link": row[3],
-      "start_time": str(row[4])
-    })
-  
-  for row in past_shows_query:
-    past_shows.append({
-      "artist_id": row[1],
-      "artist_name": row[2],
-      "artist_image_link": row[3],
-      "start_time": str(row[4])
-    })
-
-  # An alternative without using joined query:
-  # for show in venue.show:
-  #     if show.start_time > datetime.now():
-  #       upcoming_shows.append({
-  #         "artist_id": show.artist_id,
-  #         "artist_name": show.artist.name,
-  #         "artist_image_link": show.artist.image_link,
-  #         "start_time": str(show.start_time)
-  #       })
-  #     else:
-  #       past_shows.append({
-  #         "artist_id": show.artist_id,
-  #         "artist_name": show.artist.name,
-  #         "artist_image_link": show.artist.image_link,
-  #         "start_time": str(show.start_time)
-  #       })
+def venue_data(venue, shows):
+  upcoming_shows, past_shows, past_shows_cursor = shows
+  num_shows = venue.num_shows
 
   data = {
     "id": venue.id,
@@ -168,20 +582,33 @@ def show_venue(venue_id):
     "image_link": venue.image_link,
     "past_shows": past_shows,
     "upcoming_shows": upcoming_shows,
-    "past_shows_count": len(past_shows),
-    "upcoming_shows_count": len(upcoming_shows)
+    "past_shows_count": past_shows_count(num_shows, upcoming_shows, past_shows, past_shows_cursor),
+    "upcoming_shows_count": len(upcoming_shows),
+    "past_shows_cursor": past_shows_cursor
   }
-  return render_template('pages/show_venue.html', venue=data)
+  return data
+
+@views.route('/venues/<int:venue_id>/past_shows')
+def venue_past_shows(venue_id):
+  # "Load more" fragment with the next page of older past shows.
+  def render():
+    before = request.args.get('before')
+    query = past_shows_query(Show.venue_id, venue_id, Artist, Show.artist_id, 'artist', before)
+    shows, cursor = past_shows_page(query.all(), 'artist', before)
+    return render_past_shows('pages/venue_past_shows.html', 'venue',
+                             url_for('show_venue', venue_id=venue_id), shows=shows,
+                             cursor=cursor, venue_id=venue_id)
+  return conditional_response(ALL_TABLES, render, vary='X-Requested-With')
 
 #  Create Venue
 #  ----------------------------------------------------------------
 
-@app.route('/venues/create', methods=['GET'])
+@views.route('/venues/create', methods=['GET'])
 def create_venue_form():
-  form = VenueForm()
+  form = form_class('VenueForm')()
   return render_template('forms/new_venue.html', form=form)
 
-@app.route('/venues/create', methods=['POST'])
+@views.route('/venues/create', methods=['POST'])
 def create_venue_submission():
   try:
     name = request.form.get('name')
@@ -211,12 +638,13 @@ def create_venue_submission():
   return render_template('pages/home.html')
   '/venues/<int:venue_id>'
 
-@app.route('/venues/<venue_id>', methods=['DELETE'])
+@views.route('/venues/<venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
   try:
     venue = Venue.query.get(venue_id)
     db.session.delete(venue)
     db.session.commit()
+    invalidate_venue(int(venue_id))
     flash('Venue ID ' + str(venue_id) + ' was successfully deleted!')
   except:
     db.session.rollback()
@@ -227,84 +655,58 @@ def delete_venue(venue_id):
 
 #  Artists
 #  ----------------------------------------------------------------
-@app.route('/artists')
+@views.route('/artists')
 def artists():
-  data = []
-  artists = Artist.query.all()
-  for artist in artists:
-    data.append({"id": artist.id, "name": artist.name})
-  return render_template('pages/artists.html', artists=data)
+  return conditional_response([Artist.__tablename__], render_artists)
+
+ARTIST_LISTING_KEYS = [Artist.name, Artist.id]
+
+def artist_listing_query(after, before):
+  return keyset_query(db.session.query(Artist.id, Artist.name), ARTIST_LISTING_KEYS,
+                      current_app.config['LISTING_PAGE_SIZE'], after, before)
+
+def artist_items(rows):
+  return [{"id": artist.id, "name": artist.name} for artist in rows]
+
+def render_artists():
+  after, before = page_args()
+  page = listing_page(artist_listing_query(after, before).all(), ARTIST_LISTING_KEYS, after,
+                      before)
+  return render_template('pages/artists.html', artists=artist_items(page.items), page=page)
 
-@app.route('/artists/search', methods=['POST'])
+@views.route('/artists/search', methods=['POST'])
 def search_artists():
-  data = []
-  search_term = request.form.get('search_term')
-  # Case-insensitive search terms
-  results = Artist.query.filter(Artist.name.ilike("%" + search_term + "%")).all()
-  # Count the number of upcoming shows for each artist returned
-  for result in results:
-    num_upcoming_shows = 0
-    for show in result.show:
-      if show.start_time > datetime.now():
-        num_upcoming_shows += 1
-    data.append({"id": result.id, "name": result.name, "num_upcoming_shows": num_upcoming_shows})
-  response = {
-    "count": len(results),
-    "data": data
-  }
-  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+  search_term, page = search_form()
+  response = search_results(artist_search_query(search_term, page).all(), page)
+  return render_template('pages/search_artists.html', results=response, search_term=search_term)
 
-@app.route('/artists/<int:artist_id>')
+@views.route('/artists/<int:artist_id>')
 def show_artist(artist_id):
-  artist = Artist.query.get(artist_id)
+  return conditional_response(
+    ALL_TABLES, lambda: cached_page('artist', artist_id, lambda: render_artist(artist_id)))
+
+def render_artist(artist_id):
+  data = artist_details(artist_id)
+  return (render_template('pages/show_artist.html', artist=data),
+          next_start_time(data['upcoming_shows']))
+
+def artist_details(artist_id):
+  now = datetime.now()
+  artist = entity_query(Artist, ArtistSummary, ArtistSummary.artist_id, artist_id).first()
+  if artist is None:
+    abort(404)
+  rows = db.session.execute(
+    detail_shows_query(Show.artist_id, artist_id, Venue, Show.venue_id, 'venue', now))
+  return artist_data(artist, detail_shows(rows, now, 'venue'))
+
+def artist_data(artist, shows):
+  upcoming_shows, past_shows, past_shows_cursor = shows
+  num_shows = artist.num_shows
 
-  upcoming_shows = []
-  past_shows = []
-
-  # Filter Show table by artist_id and join its filtered version with Venue table
-  upcoming_shows_query = Show.query.filter_by(artist_id=artist_id).filter(
-    Show.start_time > datetime.now()).join(Venue, Show.venue_id == Venue.id).add_columns(
-      Venue.id, Venue.name, Venue.image_link, Show.start_time).all()
-  past_shows_query = Show.query.filter_by(artist_id=artist_id).filter(
-    Show.start_time <= datetime.now()).join(Venue, Show.venue_id == Venue.id).add_columns(
-      Venue.id, Venue.name, Venue.image_link, Show.start_time).all()
-
-  for row in upcoming_shows_query:
-    upcoming_shows.append({
-      "venue_id": row[1],
-      "venue_name": row[2],
-      "venue_image_link": row[3],
-      "start_time": str(row[4])
-    })
-  for row in past_shows_query:
-    past_shows.append({
-      "venue_id": row[1],
-      "venue_name": row[2],
-      "venue_image_link": row[3],
-      "start_time": str(row[4])
-    })
-  
-  # An alternative without using joined query:
-  # for show in artist.show:
-  #     if show.start_time > datetime.now():
-  #       upcoming_shows.append({
-  #         "venue_id": show.venue_id,
-  #         "venue_name": show.venue.name,
-  #         "venue_image_link": show.venue.image_link,
-  #         "start_time": str(show.start_time)
-  #       })
-  #     else:
-  #       past_shows.append({
-  #         "venue_id": show.venue_id,
-  #         "venue_name": show.venue.name,
-  #         "venue_image_link": show.venue.image_link,
-  #         "start_time": str(show.start_time)
-  #       })
-  
   data = {
     "id": artist.id,
     "name": artist.name,
-    "genres": artist.genres.strip('}{').split(','),
+    "genres": artist.genres or [],
     "city": artist.city,
     "state": artist.state,
     "phone": artist.phone,
@@ -315,20 +717,33 @@ def show_artist(artist_id):
     "image_link": artist.image_link,
     "past_shows": past_shows,
     "upcoming_shows": upcoming_shows,
-    "past_shows_count": len(past_shows),
-    "upcoming_shows_count": len(upcoming_shows)
+    "past_shows_count": past_shows_count(num_shows, upcoming_shows, past_shows, past_shows_cursor),
+    "upcoming_shows_count": len(upcoming_shows),
+    "past_shows_cursor": past_shows_cursor
   }
-  return render_template('pages/show_artist.html', artist=data)
+  return data
+
+@views.route('/artists/<int:artist_id>/past_shows')
+def artist_past_shows(artist_id):
+  # "Load more" fragment with the next page of older past shows.
+  def render():
+    before = request.args.get('before')
+    query = past_shows_query(Show.artist_id, artist_id, Venue, Show.venue_id, 'venue', before)
+    shows, cursor = past_shows_page(query.all(), 'venue', before)
+    return render_past_shows('pages/artist_past_shows.html', 'artist',
+                             url_for('show_artist', artist_id=artist_id), shows=shows,
+                             cursor=cursor, artist_id=artist_id)
+  return conditional_response(ALL_TABLES, render, vary='X-Requested-With')
 
 #  Update
 #  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@views.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
   artist = Artist.query.get(artist_id)
-  form = ArtistForm(obj=artist)
+  form = form_class('ArtistForm')(obj=artist)
   return render_template('forms/edit_artist.html', form=form, artist=artist)
 
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@views.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
   try:
     artist = Artist.query.get(artist_id)
@@ -345,6 +760,7 @@ def edit_artist_submission(artist_id):
     artist.seeking_venue = True if artist.seeking == 'y' else False
     artist.seeking_description = request.form.get('seeking_description')
     db.session.commit()
+    invalidate_artist(artist_id)
     flash('Artist ' + request.form['name'] + ' was successfully updated!')
   except:
     db.session.rollback()
@@ -353,13 +769,13 @@ def edit_artist_submission(artist_id):
     db.session.close()
   return redirect(url_for('show_artist', artist_id=artist_id))
 
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@views.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
   venue = Venue.query.get(venue_id)
-  form = VenueForm(obj=venue)
+  form = form_class('VenueForm')(obj=venue)
   return render_template('forms/edit_venue.html', form=form, venue=venue)
 
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@views.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
   try:
     venue = Venue.query.get(venue_id)
@@ -376,6 +792,7 @@ def edit_venue_submission(venue_id):
     venue.seeking_talent = True if venue.seeking == 'y' else False
     venue.seeking_description = request.form.get('seeking_description')
     db.session.commit()
+    invalidate_venue(venue_id)
     flash('Venue ' + request.form['name'] + ' was successfully updated!')
   except:
     db.session.rollback()
@@ -387,12 +804,12 @@ def edit_venue_submission(venue_id):
 #  Create Artist
 #  ----------------------------------------------------------------
 
-@app.route('/artists/create', methods=['GET'])
+@views.route('/artists/create', methods=['GET'])
 def create_artist_form():
-  form = ArtistForm()
+  form = form_class('ArtistForm')()
   return render_template('forms/new_artist.html', form=form)
 
-@app.route('/artists/create', methods=['POST'])
+@views.route('/artists/create', methods=['POST'])
 def create_artist_submission():
   try:
     name = request.form.get('name')
@@ -419,12 +836,13 @@ def create_artist_submission():
     db.session.close()
   return render_template('pages/home.html')
 
-@app.route('/artists/<artist_id>', methods=['POST'])
+@views.route('/artists/<artist_id>', methods=['POST'])
 def delete_artist(artist_id):
   try:
     artist = Artist.query.get(artist_id)
     db.session.delete(artist)
     db.session.commit()
+    invalidate_artist(int(artist_id))
     flash('Artist ID ' + str(artist_id) + ' was successfully deleted!')
   except:
     db.session.rollback()
@@ -436,35 +854,189 @@ def delete_artist(artist_id):
 #  Shows
 #  ----------------------------------------------------------------
 
-@app.route('/shows')
+@views.route('/shows')
 def shows():
-  data = []
-  shows = Show.query.all()
-  for show in shows:
-    data.append({"venue_id": show.venue_id,
-                 "venue_name": show.venue.name,
-                 "artist_id": show.artist_id,
-                 "artist_name": show.artist.name,
-                 "artist_image_link": show.artist.image_link,
-                 "start_time": str(show.start_time)})
-  return render_template('pages/shows.html', shows=data)
-
-@app.route('/shows/create')
+  def render():
+    data, page = shows_page()
+    return render_template('pages/shows.html', shows=data, page=page)
+  return conditional_response(ALL_TABLES, render)
+
+SHOW_LISTING_KEYS = [Show.start_time, Show.show_id]
+
+def show_listing_query(after, before, *criteria):
+  # Join in only the venue and artist columns the page shows, instead of
+  # lazily loading each show's venue and artist.
+  query = db.session.query(
+    Show.show_id, Show.start_time, Show.venue_id, Venue.name.label('venue_name'),
+    Show.artist_id, Artist.name.label('artist_name'),
+    Artist.image_link.label('artist_image_link')
+  ).join(Venue, Show.venue_id == Venue.id).join(Artist, Show.artist_id == Artist.id).filter(
+    Show.start_time.isnot(None), *criteria)
+  return keyset_query(query, SHOW_LISTING_KEYS, current_app.config['LISTING_PAGE_SIZE'], after, before)
+
+def show_items(rows):
+  return [{"venue_id": show.venue_id,
+           "venue_name": show.venue_name,
+           "artist_id": show.artist_id,
+           "artist_name": show.artist_name,
+           "artist_image_link": show.artist_image_link,
+           "start_time": show.start_time} for show in rows]
+
+def shows_page(*criteria):
+  after, before = page_args()
+  page = listing_page(show_listing_query(after, before, *criteria).all(), SHOW_LISTING_KEYS,
+                      after, before)
+  return show_items(page.items), page
+
+@views.route('/shows/browse')
+def browse_shows():
+  # Upcoming shows of artists playing a genre, optionally in one state. The
+  # genre is matched by array containment, which Postgres answers from the
+  # GIN index on Artist.genres.
+  genre, state = request.args.get('genre') or None, request.args.get('state') or None
+  criteria = browse_criteria(genre, state)
+  def render():
+    data, page = shows_page(*criteria)
+    return render_template('pages/browse_shows.html', shows=data, page=page, genre=genre,
+                           state=state, genres=genre_choices, states=state_choices)
+  return conditional_response(ALL_TABLES, render)
+
+def browse_criteria(genre, state):
+  if (genre and genre not in dict(genre_choices)) or (state and state not in dict(state_choices)):
+    abort(400)
+  criteria = [Show.start_time > datetime.now()]
+  if genre:
+    criteria.append(Artist.genres.contains(genre_array([genre])))
+  if state:
+    criteria.append(Venue.state == state)
+  return criteria
+
+@views.route('/shows/calendar')
+def calendar_shows():
+  # What is on between two dates, optionally only in one city or state and
+  # by artists of one genre, with the number of shows on each day.
+  filters = calendar_filters(request.args)
+  def render():
+    data, page = shows_page(*calendar_criteria(filters))
+    days = calendar_days(calendar_days_query(filters).all())
+    return render_template('pages/calendar.html', shows=data, page=page, days=days,
+                           genres=genre_choices, states=state_choices, **calendar_args(filters))
+  return conditional_response(ALL_TABLES, render)
+
+def calendar_filters(args):
+  # `start` and `end` are inclusive dates; the window defaults to the
+  # coming week and spans at most CALENDAR_MAX_DAYS days.
+  today = datetime.combine(date.today(), datetime.min.time())
+  try:
+    start = parse_day(args.get('start'), today)
+    end = parse_day(args.get('end'), start + timedelta(days=6)) + timedelta(days=1)
+  except (ValueError, OverflowError):
+    abort(400)
+  filters = {
+    'start': start,
+    'end': end,
+    'city': args.get('city', '').strip() or None,
+    'state': args.get('state') or None,
+    'genre': args.get('genre') or None,
+  }
+  days = (filters['end'] - start).days
+  if not 0 < days <= current_app.config['CALENDAR_MAX_DAYS']:
+    abort(400)
+  if (filters['genre'] and filters['genre'] not in dict(genre_choices)) or (
+      filters['state'] and filters['state'] not in dict(state_choices)):
+    abort(400)
+  return filters
+
+def parse_day(value, default):
+  return datetime.strptime(value, '%Y-%m-%d') if value else default
+
+def calendar_args(filters):
+  # The query arguments of the calendar page of `filters`.
+  return {'start': filters['start'].date().isoformat(),
+          'end': (filters['end'] - timedelta(days=1)).date().isoformat(),
+          'city': filters['city'], 'state': filters['state'], 'genre': filters['genre']}
+
+def calendar_criteria(filters):
+  # The window is a range on Show.start_time, which the btree
+  # (start_time, show_id) index answers page by page and the BRIN index in
+  # bulk; a city is looked up in the (lower(city), state) index of Venue.
+  criteria = [Show.start_time >= filters['start'], Show.start_time < filters['end']]
+  if filters['city']:
+    criteria.append(func.lower(Venue.city) == filters['city'].lower())
+  if filters['state']:
+    criteria.append(Venue.state == filters['state'])
+  if filters['genre']:
+    criteria.append(Artist.genres.contains(genre_array([filters['genre']])))
+  return criteria
+
+def calendar_days_query(filters):
+  # The number of shows on each day of the window. 'day' is inlined: with
+  # bound parameters, as in the async mode, Postgres could not tell that
+  # the grouped and selected expressions are the same.
+  day = func.date_trunc(literal_column("'day'"), Show.start_time).label('day')
+  query = db.session.query(day, func.count().label('shows')).join(
+    Venue, Show.venue_id == Venue.id)
+  if filters['genre']:
+    query = query.join(Artist, Show.artist_id == Artist.id)
+  return query.filter(*calendar_criteria(filters)).group_by(day).order_by(day)
+
+def calendar_days(rows):
+  return [{"date": row.day.date(), "shows": row.shows} for row in rows]
+
+def calendar_body(data, days, page, args, build_url):
+  # `build_url` is the url_for() of the serving mode: Flask's here, Quart's
+  # in async_app.py, which has no Flask request context to build URLs in.
+  return {
+    "data": data,
+    "days": days,
+    "next": page.next_cursor and build_url('api_calendar_shows', after=page.next_cursor, **args),
+    "prev": page.prev_cursor and build_url('api_calendar_shows', before=page.prev_cursor, **args),
+  }
+
+@views.route('/shows/create')
 def create_shows():
   # renders form. do not touch.
-  form = ShowForm()
+  form = form_class('ShowForm')()
   return render_template('forms/new_show.html', form=form)
 
-@app.route('/shows/create', methods=['POST'])
+def show_slot(data):
+  # Raises ValueError, KeyError or TypeError on a malformed slot.
+  duration = data.get('duration_minutes')
+  duration = DEFAULT_SHOW_DURATION_MINUTES if duration in (None, '') else int(duration)
+  if not 0 < duration <= MAX_SHOW_DURATION_MINUTES:
+    raise ValueError('duration_minutes out of range')
+  start_time = parse_datetime(data['start_time'])
+  # Show times are naive local times; an offset has nothing to compare to.
+  if start_time.tzinfo is not None:
+    raise ValueError('start_time has a time zone')
+  return Slot(int(data['venue_id']), int(data['artist_id']), start_time, duration)
+
+def conflict_message(conflict):
+  return 'Show could not be listed: the %s is already booked from %s to %s.' % (
+    conflict['reason'], format_datetime(conflict['start_time']),
+    format_datetime(conflict['end_time']))
+
+@views.route('/shows/create', methods=['POST'])
 def create_show_submission():
   try:
-    venue_id = request.form.get('venue_id')
-    artist_id = request.form.get('artist_id')
-    start_time = request.form.get('start_time')
-    show = Show(venue_id=venue_id, artist_id=artist_id, start_time=start_time)
-    db.session.add(show)
-    db.session.commit()
-    flash('Show was successfully listed!')
+    slot = show_slot(request.form)
+    # Hold the venue and artist until commit, so that no other booking of
+    # either can slip in between the conflict check and the insert.
+    if not scheduler.lock(slot.venue_id, slot.artist_id):
+      raise ValueError('no such venue or artist')
+    conflicts = scheduler.conflicts([slot])[0]
+    if conflicts:
+      # Nothing was written; closing the session releases the locks.
+      flash(conflict_message(conflicts[0]))
+    else:
+      show = Show(**slot._asdict())
+      db.session.add(show)
+      summaries.record(show)
+      db.session.commit()
+      page_cache.invalidate('venue', slot.venue_id)
+      page_cache.invalidate('artist', slot.artist_id)
+      page_cache.invalidate('shows')
+      flash('Show was successfully listed!')
   except:
     db.session.rollback()
     flash('An error occurred. Show could not be listed.')
@@ -472,24 +1044,304 @@ def create_show_submission():
     db.session.close()
   return render_template('pages/home.html')
 
-@app.errorhandler(404)
+#  Export
+#  ----------------------------------------------------------------
+
+def export_venues():
+  columns = [Venue.id, Venue.name, Venue.genres, Venue.address, Venue.city, Venue.state,
+             Venue.phone, Venue.website, Venue.image_link, Venue.facebook_link,
+             Venue.seeking_talent, Venue.seeking_description, Venue.updated_at]
+  return db.session.query(*columns).order_by(Venue.id), Venue.updated_at
+
+def export_artists():
+  columns = [Artist.id, Artist.name, Artist.genres, Artist.city, Artist.state, Artist.phone,
+             Artist.website, Artist.image_link, Artist.facebook_link, Artist.seeking_venue,
+             Artist.seeking_description, Artist.updated_at]
+  return db.session.query(*columns).order_by(Artist.id), Artist.updated_at
+
+def export_shows():
+  query = db.session.query(
+    Show.show_id, Show.start_time, Show.duration_minutes, Show.venue_id,
+    Venue.name.label('venue_name'), Show.artist_id, Artist.name.label('artist_name'),
+    Show.updated_at
+  ).join(Venue, Show.venue_id == Venue.id).join(Artist, Show.artist_id == Artist.id).order_by(
+    Show.show_id)
+  return query, Show.updated_at
+
+# Each export returns its query and the column `since` filters on.
+EXPORTS = {'venues': export_venues, 'artists': export_artists, 'shows': export_shows}
+
+@views.route('/export/<kind>')
+def export(kind):
+  # Stream a full dump as CSV or NDJSON; with `since` (UTC), only the rows
+  # created or changed from then on.
+  if kind not in EXPORTS:
+    abort(404)
+  fmt = request.args.get('format', 'ndjson')
+  if fmt not in EXPORT_FORMATS:
+    abort(400)
+  query, since_column = EXPORTS[kind]()
+  since = request.args.get('since')
+  if since:
+    try:
+      query = query.filter(since_column >= parse_datetime(since))
+    except (ValueError, OverflowError):
+      abort(400)
+  columns = [column['name'] for column in query.column_descriptions]
+  chunks = stream_export(query, columns, fmt, current_app.config['EXPORT_BATCH_SIZE'])
+  response = Response(stream_with_context(chunks), content_type=EXPORT_FORMATS[fmt])
+  response.headers['Content-Disposition'] = 'attachment; filename=%s.%s' % (kind, fmt)
+  return response
+
+#  JSON API
+#  ----------------------------------------------------------------
+
+@views.route('/api/v1/venues/<int:venue_id>')
+def api_venue(venue_id):
+  def build():
+    data = venue_details(venue_id)
+    return data, next_start_time(data['upcoming_shows'])
+  return conditional_response(ALL_TABLES, lambda: cached_json('venue', venue_id, 'json', build))
+
+@views.route('/api/v1/venues/<int:venue_id>/past_shows')
+def api_venue_past_shows(venue_id):
+  def render():
+    before = request.args.get('before')
+    query = past_shows_query(Show.venue_id, venue_id, Artist, Show.artist_id, 'artist', before)
+    data, cursor = past_shows_page(query.all(), 'artist', before)
+    body = {"data": data,
+            "next": cursor and url_for('api_venue_past_shows', venue_id=venue_id, before=cursor)}
+    return Response(json.dumps(body, default=to_json_value), mimetype='application/json')
+  return conditional_response(ALL_TABLES, render)
+
+@views.route('/api/v1/artists/<int:artist_id>')
+def api_artist(artist_id):
+  def build():
+    data = artist_details(artist_id)
+    return data, next_start_time(data['upcoming_shows'])
+  return conditional_response(ALL_TABLES,
+                              lambda: cached_json('artist', artist_id, 'json', build))
+
+@views.route('/api/v1/artists/<int:artist_id>/past_shows')
+def api_artist_past_shows(artist_id):
+  def render():
+    before = request.args.get('before')
+    query = past_shows_query(Show.artist_id, artist_id, Venue, Show.venue_id, 'venue', before)
+    data, cursor = past_shows_page(query.all(), 'venue', before)
+    body = {"data": data,
+            "next": cursor and url_for('api_artist_past_shows', artist_id=artist_id, before=cursor)}
+    return Response(json.dumps(body, default=to_json_value), mimetype='application/json')
+  return conditional_response(ALL_TABLES, render)
+
+@views.route('/api/v1/shows')
+def api_shows():
+  after, before = request.args.get('after'), request.args.get('before')
+  def build():
+    data, page = shows_page()
+    return {
+      "data": data,
+      "next": page.next_cursor and url_for('api_shows', after=page.next_cursor),
+      "prev": page.prev_cursor and url_for('api_shows', before=page.prev_cursor),
+    }, None
+  return conditional_response(ALL_TABLES,
+                              lambda: cached_json('shows', (after, before), 'json', build))
+
+@views.route('/api/v1/shows/conflicts', methods=['POST'])
+def check_show_conflicts():
+  # Check up to SCHEDULE_CHECK_MAX_SLOTS proposed slots, given as
+  # {"slots": [{"venue_id", "artist_id", "start_time", "duration_minutes"}]},
+  # against the schedule and against each other. Nothing is booked.
+  body = request.get_json(force=True, silent=True)
+  try:
+    slots = [show_slot(data) for data in body['slots']]
+  except (KeyError, TypeError, ValueError, AttributeError, OverflowError):
+    abort(400)
+  if not slots or len(slots) > current_app.config['SCHEDULE_CHECK_MAX_SLOTS']:
+    abort(400)
+  # Slots of an unknown venue or artist are invalid rather than available,
+  # and are left out of the check.
+  errors = scheduler.unknown(slots)
+  valid = [index for index, slot_errors in enumerate(errors) if not slot_errors]
+  conflicts = {}
+  for index, found in zip(valid, scheduler.conflicts([slots[index] for index in valid])):
+    # scheduler.conflicts() numbers the other slots among the valid ones.
+    conflicts[index] = [dict(conflict, slot=valid[conflict['slot']]) if 'slot' in conflict
+                        else conflict for conflict in found]
+  results = [{"slot": index, "available": index in conflicts and not conflicts[index],
+              "conflicts": conflicts.get(index, []), "errors": errors[index]}
+             for index in range(len(slots))]
+  return Response(json.dumps({"results": results}, default=to_json_value),
+                  mimetype='application/json')
+
+@views.route('/api/v1/shows/calendar')
+def api_calendar_shows():
+  filters = calendar_filters(request.args)
+  def render():
+    data, page = shows_page(*calendar_criteria(filters))
+    days = calendar_days(calendar_days_query(filters).all())
+    body = calendar_body(data, days, page, calendar_args(filters), url_for)
+    return Response(json.dumps(body, default=to_json_value), mimetype='application/json')
+  return conditional_response(ALL_TABLES, render)
+
+#  Cache
+#  ----------------------------------------------------------------
+
+@views.route('/cache/stats')
+def cache_stats():
+  return jsonify(page_cache.stats())
+
+#  Metrics
+#  ----------------------------------------------------------------
+
+@views.route('/metrics')
+def prometheus_metrics():
+  return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+#  Connection pool
+#  ----------------------------------------------------------------
+
+@views.route('/pool/stats')
+def connection_pool_stats():
+  stats = pool_stats(db.engine)
+  if replicas.binds:
+    stats['replicas'] = replicas.stats()
+  return jsonify(stats)
+
+#  Show summaries
+#  ----------------------------------------------------------------
+
+summaries_cli = AppGroup('summaries', help='Maintain the per-venue and per-artist show counts.')
+
+@summaries_cli.command('roll-forward')
+def roll_forward_summaries():
+  """Recount venues and artists whose next show has started."""
+  venue_ids, artist_ids = summaries.roll_forward()
+  db.session.commit()
+  click.echo('Rolled forward %d venues and %d artists.' % (len(venue_ids), len(artist_ids)))
+
+@summaries_cli.command('refresh')
+def refresh_summaries():
+  """Recount every venue and artist from the Show table."""
+  summaries.refresh()
+  db.session.commit()
+  click.echo('Refreshed all show summaries.')
+
+#  Static assets
+#  ----------------------------------------------------------------
+
+assets_cli = AppGroup('assets', help='Build the static asset bundles.')
+
+@assets_cli.command('build')
+def build_assets():
+  """Concatenate, minify and precompress the bundles into static/dist."""
+  for name, filename in sorted(assets.build().items()):
+    size = os.path.getsize(os.path.join(assets.dist, filename))
+    br_size = os.path.getsize(os.path.join(assets.dist, filename + '.br'))
+    click.echo('%s -> %s (%d bytes, %d with brotli)' % (name, filename, size, br_size))
+
+#  Bulk import
+#  ----------------------------------------------------------------
+
+def import_show_keys(rows):
+  errors = resolve_foreign_key(db, Venue, 'venue', rows)
+  errors.update({index: error for index, error in
+                 resolve_foreign_key(db, Artist, 'artist', rows).items() if index not in errors})
+  errors.update(import_show_conflicts(rows, errors))
+  return errors
+
+def import_show_conflicts(rows, errors):
+  # Like create_show_submission(), hold the batch's venues and artists until
+  # it commits, then reject the rows that overlap a booked show or an
+  # earlier row of the file that is being imported.
+  indexes = [index for index in range(len(rows)) if index not in errors]
+  slots = [Slot(*(rows[index][1][key] for key in Slot._fields)) for index in indexes]
+  scheduler.lock_all({slot.venue_id for slot in slots}, {slot.artist_id for slot in slots})
+  rejected = {}
+  for position, conflicts in enumerate(scheduler.conflicts(slots)):
+    conflict = next((conflict for conflict in conflicts
+                     if 'show_id' in conflict
+                     or conflict['slot'] < position and indexes[conflict['slot']] not in rejected),
+                    None)
+    if conflict is not None:
+      rejected[indexes[position]] = {'start_time': [import_conflict_message(conflict)]}
+  return rejected
+
+def import_conflict_message(conflict):
+  booking = ('show %d' % conflict['show_id'] if 'show_id' in conflict
+             else 'an earlier row')
+  return 'The %s is already booked from %s to %s by %s.' % (
+    conflict['reason'], format_datetime(conflict['start_time']),
+    format_datetime(conflict['end_time']), booking)
+
+def recount_imported_shows(values):
+  summaries.refresh(venue_ids={row['venue_id'] for row in values},
+                    artist_ids={row['artist_id'] for row in values})
+
+IMPORTS = {
+  'venues': (Venue, 'VenueForm', ['name', 'genres', 'address', 'city', 'state', 'phone',
+                                  'website', 'image_link', 'facebook_link', 'seeking_talent',
+                                  'seeking_description'], None, None),
+  'artists': (Artist, 'ArtistForm', ['name', 'genres', 'city', 'state', 'phone', 'website',
+                                     'image_link', 'facebook_link', 'seeking_venue',
+                                     'seeking_description'], None, None),
+  'shows': (Show, 'ShowForm', ['venue_id', 'artist_id', 'start_time', 'duration_minutes'],
+            import_show_keys, recount_imported_shows),
+}
+
+@click.command('import-data')
+@with_appcontext
+@click.argument('kind', type=click.Choice(sorted(IMPORTS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']),
+              help='Input format; guessed from the file extension by default.')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows per INSERT and commit.')
+@click.option('--rejects', type=click.File('w'), help='Write rejected rows here as NDJSON.')
+def import_data(kind, path, fmt, batch_size, rejects):
+  """Import venues, artists or shows from a CSV or NDJSON file.
+
+  Rows are validated with the same rules as the HTML forms. Shows refer to
+  their venue and artist by venue_id/artist_id or by venue_name/artist_name,
+  and are rejected if they overlap a booked show or an earlier row.
+  In CSV files, multiple genres are separated by semicolons.
+  """
+  model, form_name, columns, resolve, after_batch = IMPORTS[kind]
+  report = ImportReport(rejects)
+  rows = read_rows(path, fmt or detect_format(path))
+
+  def record_batch(values):
+    # Multi-row INSERTs bypass the ORM, so bump the table's version here.
+    changes.bump(db.session, [model.__tablename__])
+    if after_batch is not None:
+      after_batch(values)
+
+  run_import(db, model.__table__, form_class(form_name), columns, rows, batch_size, report,
+             resolve=resolve, after_batch=record_batch,
+             progress=lambda report: click.echo(report.summary(), err=True))
+  click.echo(report.summary())
+
 def not_found_error(error):
     return render_template('errors/404.html'), 404
 
-@app.errorhandler(500)
 def server_error(error):
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+def configure_logging(app):
+    # Every app shares the same logger, so each app built in one process
+    # (tests, the CLI, a gunicorn master and its workers) must not add
+    # another handler for the same file.
+    if not app.debug:
+        path = os.path.abspath('error.log')
+        if any(isinstance(handler, FileHandler) and handler.baseFilename == path
+               for handler in app.logger.handlers):
+            return
+        file_handler = FileHandler(path)
+        file_handler.setFormatter(
+            Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+        )
+        app.logger.setLevel(logging.INFO)
+        file_handler.setLevel(logging.INFO)
+        app.logger.addHandler(file_handler)
 
 #----------------------------------------------------------------------------#
 # Launch.
@@ -497,11 +1349,11 @@ if not app.debug:
 
 # Default port:
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
@@ -0,0 +1,144 @@
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import re
+
+import brotli
+import rcssmin
+import rjsmin
+
+# Bundles of static files, in the order they are concatenated. Paths are
+# relative to the static folder.
+BUNDLES = {
+    'main.css': [
+        'css/bootstrap.min.css',
+        'css/layout.main.css',
+        'css/main.css',
+        'css/main.responsive.css',
+        'css/main.quickfix.css',
+    ],
+    # Loaded in <head>: Modernizr has to run before the page renders.
+    'head.js': [
+        'js/libs/modernizr-2.8.2.min.js',
+        'js/libs/moment.min.js',
+    ],
+    'main.js': [
+        'js/libs/jquery-1.11.1.min.js',
+        'js/libs/bootstrap-3.1.1.min.js',
+        'js/plugins.js',
+        'js/script.js',
+    ],
+}
+
+# Precompressed variants by content coding, in order of preference.
+ENCODINGS = [
+    ('br', '.br', lambda data: brotli.compress(data, quality=11)),
+    ('gzip', '.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0)),
+]
+
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+def minify(path, text):
+    # Files that come minified are used as they are.
+    if '.min.' in posixpath.basename(path):
+        return text
+    if path.endswith('.css'):
+        return rcssmin.cssmin(text)
+    return rjsmin.jsmin(text)
+
+
+def rebase_css_urls(path, text, static_url_path):
+    # Relative url()s point next to the source file; make them absolute so
+    # they still resolve from the bundle's location.
+    def rebase(match):
+        url = match.group(2)
+        if re.match(r'^([a-z]+:|/|#)', url):
+            return match.group(0)
+        resolved = posixpath.normpath(posixpath.join(posixpath.dirname(path), url))
+        return 'url("%s/%s")' % (static_url_path, resolved)
+    return CSS_URL.sub(rebase, text)
+
+
+class Assets(object):
+    """Builds and serves fingerprinted, precompressed static bundles.
+
+    ``build()`` concatenates and minifies each bundle into ``dist/`` of the
+    static folder as ``<name>.<content hash>.<ext>``, next to ``.br`` and
+    ``.gz`` copies, and records the file names in ``dist/manifest.json``.
+    ``urls()`` gives the URLs a page loads for a bundle: the built file when
+    there is a manifest, or else the individual source files, so the app
+    also works without a build step during development.
+    """
+
+    def __init__(self, static_folder=None, static_url_path=None, bundles=BUNDLES):
+        self.bundles = bundles
+        self.manifest = {}
+        if static_folder is not None:
+            self.configure(static_folder, static_url_path)
+
+    def init_app(self, app):
+        self.configure(app.static_folder, app.static_url_path)
+        app.jinja_env.globals['asset_urls'] = self.urls
+
+    def configure(self, static_folder, static_url_path):
+        self.static_folder = static_folder
+        self.static_url_path = static_url_path
+        self.dist = os.path.join(static_folder, 'dist')
+        self.manifest = self.load_manifest()
+
+    def load_manifest(self):
+        try:
+            with open(os.path.join(self.dist, 'manifest.json')) as manifest:
+                return json.load(manifest)
+        except (IOError, ValueError):
+            return {}
+
+    def build(self):
+        os.makedirs(self.dist, exist_ok=True)
+        manifest = {}
+        for name, paths in sorted(self.bundles.items()):
+            parts = []
+            for path in paths:
+                with open(os.path.join(self.static_folder, path), encoding='utf-8') as source:
+                    text = minify(path, source.read())
+                if name.endswith('.css'):
+                    text = rebase_css_urls(path, text, self.static_url_path)
+                parts.append(text.strip())
+            # JS files are separated by semicolons in case one lacks its last.
+            data = (';\n' if name.endswith('.js') else '\n').join(parts).encode('utf-8') + b'\n'
+            stem, ext = posixpath.splitext(name)
+            filename = '%s.%s%s' % (stem, hashlib.sha256(data).hexdigest()[:12], ext)
+            self.write(filename, data)
+            for encoding, suffix, compress in ENCODINGS:
+                self.write(filename + suffix, compress(data))
+            manifest[name] = filename
+        with open(os.path.join(self.dist, 'manifest.json'), 'w') as output:
+            json.dump(manifest, output, indent=2, sort_keys=True)
+        self.manifest = manifest
+        return manifest
+
+    def write(self, filename, data):
+        with open(os.path.join(self.dist, filename), 'wb') as output:
+            output.write(data)
+
+    def urls(self, name):
+        if name in self.manifest:
+            return [self.static_url_path + '/dist/' + self.manifest[name]]
+        return [self.static_url_path + '/' + path for path in self.bundles[name]]
+
+    def encoded_file(self, filename, accept_encodings):
+        """Return the file to send for a built bundle and its content coding.
+
+        ``accept_encodings`` is the request's Accept-Encoding header as
+        parsed by Werkzeug. Returns (None, None) for unknown files.
+        """
+        if filename not in self.manifest.values():
+            return None, None
+        for encoding, suffix, compress in ENCODINGS:
+            if accept_encodings[encoding] and os.path.exists(
+                    os.path.join(self.dist, filename + suffix)):
+                return filename + suffix, encoding
+        return filename, None
@@ -0,0 +1,326 @@
+import json
+from datetime import datetime
+
+from quart import Quart, Response, render_template, request, url_for
+from werkzeug.exceptions import HTTPException, NotFound
+from werkzeug.http import is_resource_modified
+
+from app import (ALL_TABLES, ARTIST_LISTING_KEYS, SHOW_LISTING_KEYS, VENUE_LISTING_KEYS,
+                 artist_data, artist_items, artist_listing_query, artist_search_query, assets,
+                 browse_criteria, calendar_args, calendar_body, calendar_criteria, calendar_days,
+                 calendar_days_query, calendar_filters, changes, create_app, detail_shows,
+                 detail_shows_query, entity_query, format_datetime, last_show_started,
+                 listing_page, page_etag, past_shows_page, past_shows_query, search_results,
+                 show_items, show_listing_query, venue_areas, venue_data, venue_listing_query,
+                 venue_search_query)
+from asyncdb import AsyncDatabase
+from choices import genre_choices, state_choices
+from export import to_json_value
+from models import Artist, ArtistSummary, Show, Venue, VenueSummary
+
+# Async serving mode for the read-only routes. It shares the models, queries
+# and templates of app.py but runs the queries on an asyncpg pool, so one
+# process keeps many slow clients in flight. Writes stay on the Flask app.
+# Run it with `hypercorn async_app:app`.
+
+app = Quart(__name__)
+app.config.from_object('config')
+# The shared query helpers build their queries on the Flask-SQLAlchemy
+# session and read their settings from flask.current_app.
+flask_app = create_app('config')
+app.jinja_env.filters['datetime'] = format_datetime
+app.jinja_env.globals['asset_urls'] = assets.urls
+
+database = AsyncDatabase(app.config['SQLALCHEMY_DATABASE_URI'],
+                         min_size=app.config['ASYNC_DB_POOL_MIN_SIZE'],
+                         max_size=app.config['ASYNC_DB_POOL_MAX_SIZE'],
+                         timeout=app.config['DB_POOL_TIMEOUT'],
+                         statement_cache_size=0 if app.config['DB_PGBOUNCER'] else 100)
+
+
+@app.before_serving
+async def connect_database():
+    # Requests are served on this thread, so the context stays current for all of them.
+    flask_app.app_context().push()
+    await database.connect()
+
+
+@app.after_serving
+async def close_database():
+    await database.close()
+
+
+@app.errorhandler(HTTPException)
+async def http_error(error):
+    # The shared query helpers abort with Werkzeug exceptions.
+    if error.code == 404:
+        return await render_template('errors/404.html'), 404
+    return Response(error.description, status=error.code)
+
+
+@app.errorhandler(500)
+async def server_error(error):
+    return await render_template('errors/500.html'), 500
+
+
+async def conditional_response(tables, render, vary=None):
+    # Same validators as conditional_response() in app.py, so the ETags of
+    # both serving modes agree.
+    row = await database.first(changes.validator_query(tables, last_show_started()))
+    version, last_modified = changes.validator_result(row, True)
+    full_path = request.path + '?' + request.query_string.decode('ascii')
+    etag = page_etag(full_path, version, request.headers.get(vary, '') if vary else None)
+    environ = {'REQUEST_METHOD': request.method}
+    for header in ('If-None-Match', 'If-Modified-Since'):
+        if header in request.headers:
+            environ['HTTP_' + header.upper().replace('-', '_')] = request.headers[header]
+    if is_resource_modified(environ, etag, last_modified=last_modified):
+        response = await render()
+        if not isinstance(response, Response):
+            response = Response(response)
+    else:
+        response = Response('', status=304)
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    if vary:
+        response.vary.add(vary)
+    return response
+
+
+def json_response(body):
+    return Response(json.dumps(body, default=to_json_value), mimetype='application/json')
+
+
+def page_args():
+    return request.args.get('after'), request.args.get('before')
+
+
+async def venue_details(venue_id):
+    now = datetime.now()
+    venue = await database.first(
+        entity_query(Venue, VenueSummary, VenueSummary.venue_id, venue_id))
+    if venue is None:
+        raise NotFound()
+    rows = await database.all(
+        detail_shows_query(Show.venue_id, venue_id, Artist, Show.artist_id, 'artist', now))
+    return venue_data(venue, detail_shows(rows, now, 'artist'))
+
+
+async def artist_details(artist_id):
+    now = datetime.now()
+    artist = await database.first(
+        entity_query(Artist, ArtistSummary, ArtistSummary.artist_id, artist_id))
+    if artist is None:
+        raise NotFound()
+    rows = await database.all(
+        detail_shows_query(Show.artist_id, artist_id, Venue, Show.venue_id, 'venue', now))
+    return artist_data(artist, detail_shows(rows, now, 'venue'))
+
+
+async def past_shows(show_key, entity_id, other, other_key, prefix):
+    before = request.args.get('before')
+    rows = await database.all(
+        past_shows_query(show_key, entity_id, other, other_key, prefix, before))
+    return past_shows_page(rows, prefix, before)
+
+
+async def render_past_shows(fragment, back_label, back, **context):
+    # As render_past_shows() in app.py: a full page unless the "Load more"
+    # script asked for the fragment.
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return await render_template(fragment, **context)
+    return await render_template('pages/past_shows.html', fragment=fragment,
+                                 back_label=back_label, back=back, **context)
+
+
+async def shows_page(*criteria):
+    after, before = page_args()
+    rows = await database.all(show_listing_query(after, before, *criteria))
+    page = listing_page(rows, SHOW_LISTING_KEYS, after, before)
+    return show_items(page.items), page
+
+
+#  Pages
+#  ----------------------------------------------------------------
+
+@app.route('/')
+async def index():
+    return await render_template('pages/home.html')
+
+
+@app.route('/venues')
+async def venues():
+    async def render():
+        after, before = page_args()
+        rows = await database.all(venue_listing_query(after, before))
+        page = listing_page(rows, VENUE_LISTING_KEYS, after, before)
+        return await render_template('pages/venues.html', areas=venue_areas(page.items),
+                                     page=page)
+    return await conditional_response([Venue.__tablename__, Show.__tablename__], render)
+
+
+@app.route('/venues/search', methods=['POST'])
+async def search_venues():
+    form = await request.form
+    search_term, page = form.get('search_term', ''), max(form.get('page', 1, type=int), 1)
+    response = search_results(await database.all(venue_search_query(search_term, page)), page)
+    return await render_template('pages/search_venues.html', results=response,
+                                 search_term=search_term)
+
+
+@app.route('/venues/<int:venue_id>')
+async def show_venue(venue_id):
+    async def render():
+        data = await venue_details(venue_id)
+        return await render_template('pages/show_venue.html', venue=data)
+    return await conditional_response(ALL_TABLES, render)
+
+
+@app.route('/venues/<int:venue_id>/past_shows')
+async def venue_past_shows(venue_id):
+    async def render():
+        shows, cursor = await past_shows(Show.venue_id, venue_id, Artist, Show.artist_id,
+                                         'artist')
+        return await render_past_shows('pages/venue_past_shows.html', 'venue',
+                                       url_for('show_venue', venue_id=venue_id), shows=shows,
+                                       cursor=cursor, venue_id=venue_id)
+    return await conditional_response(ALL_TABLES, render, vary='X-Requested-With')
+
+
+@app.route('/artists')
+async def artists():
+    async def render():
+        after, before = page_args()
+        rows = await database.all(artist_listing_query(after, before))
+        page = listing_page(rows, ARTIST_LISTING_KEYS, after, before)
+        return await render_template('pages/artists.html', artists=artist_items(page.items),
+                                     page=page)
+    return await conditional_response([Artist.__tablename__], render)
+
+
+@app.route('/artists/search', methods=['POST'])
+async def search_artists():
+    form = await request.form
+    search_term, page = form.get('search_term', ''), max(form.get('page', 1, type=int), 1)
+    response = search_results(await database.all(artist_search_query(search_term, page)), page)
+    return await render_template('pages/search_artists.html', results=response,
+                                 search_term=search_term)
+
+
+@app.route('/artists/<int:artist_id>')
+async def show_artist(artist_id):
+    async def render():
+        data = await artist_details(artist_id)
+        return await render_template('pages/show_artist.html', artist=data)
+    return await conditional_response(ALL_TABLES, render)
+
+
+@app.route('/artists/<int:artist_id>/past_shows')
+async def artist_past_shows(artist_id):
+    async def render():
+        shows, cursor = await past_shows(Show.artist_id, artist_id, Venue, Show.venue_id,
+                                         'venue')
+        return await render_past_shows('pages/artist_past_shows.html', 'artist',
+                                       url_for('show_artist', artist_id=artist_id), shows=shows,
+                                       cursor=cursor, artist_id=artist_id)
+    return await conditional_response(ALL_TABLES, render, vary='X-Requested-With')
+
+
+@app.route('/shows')
+async def shows():
+    async def render():
+        data, page = await shows_page()
+        return await render_template('pages/shows.html', shows=data, page=page)
+    return await conditional_response(ALL_TABLES, render)
+
+
+@app.route('/shows/browse')
+async def browse_shows():
+    genre, state = request.args.get('genre') or None, request.args.get('state') or None
+    criteria = browse_criteria(genre, state)
+
+    async def render():
+        data, page = await shows_page(*criteria)
+        return await render_template('pages/browse_shows.html', shows=data, page=page,
+                                     genre=genre, state=state, genres=genre_choices,
+                                     states=state_choices)
+    return await conditional_response(ALL_TABLES, render)
+
+
+@app.route('/shows/calendar')
+async def calendar_shows():
+    filters = calendar_filters(request.args)
+
+    async def render():
+        data, page = await shows_page(*calendar_criteria(filters))
+        days = calendar_days(await database.all(calendar_days_query(filters)))
+        return await render_template('pages/calendar.html', shows=data, page=page, days=days,
+                                     genres=genre_choices, states=state_choices,
+                                     **calendar_args(filters))
+    return await conditional_response(ALL_TABLES, render)
+
+
+#  JSON API
+#  ----------------------------------------------------------------
+
+@app.route('/api/v1/venues/<int:venue_id>')
+async def api_venue(venue_id):
+    async def render():
+        return json_response(await venue_details(venue_id))
+    return await conditional_response(ALL_TABLES, render)
+
+
+@app.route('/api/v1/venues/<int:venue_id>/past_shows')
+async def api_venue_past_shows(venue_id):
+    async def render():
+        data, cursor = await past_shows(Show.venue_id, venue_id, Artist, Show.artist_id,
+                                        'artist')
+        return json_response({"data": data, "next": cursor and url_for(
+            'api_venue_past_shows', venue_id=venue_id, before=cursor)})
+    return await conditional_response(ALL_TABLES, render)
+
+
+@app.route('/api/v1/artists/<int:artist_id>')
+async def api_artist(artist_id):
+    async def render():
+        return json_response(await artist_details(artist_id))
+    return await conditional_response(ALL_TABLES, render)
+
+
+@app.route('/api/v1/artists/<int:artist_id>/past_shows')
+async def api_artist_past_shows(artist_id):
+    async def render():
+        data, cursor = await past_shows(Show.artist_id, artist_id, Venue, Show.venue_id,
+                                        'venue')
+        return json_response({"data": data, "next": cursor and url_for(
+            'api_artist_past_shows', artist_id=artist_id, before=cursor)})
+    return await conditional_response(ALL_TABLES, render)
+
+
+@app.route('/api/v1/shows')
+async def api_shows():
+    async def render():
+        data, page = await shows_page()
+        return json_response({
+            "data": data,
+            "next": page.next_cursor and url_for('api_shows', after=page.next_cursor),
+            "prev": page.prev_cursor and url_for('api_shows', before=page.prev_cursor),
+        })
+    return await conditional_response(ALL_TABLES, render)
+
+
+@app.route('/api/v1/shows/calendar')
+async def api_calendar_shows():
+    filters = calendar_filters(request.args)
+
+    async def render():
+        data, page = await shows_page(*calendar_criteria(filters))
+        days = calendar_days(await database.all(calendar_days_query(filters)))
+        return json_response(calendar_body(data, days, page, calendar_args(filters), url_for))
+    return await conditional_response(ALL_TABLES, render)
+
+
+@app.route('/pool/stats')
+async def connection_pool_stats():
+    return json_response(database.stats())
@@ -0,0 +1,72 @@
+import asyncpg
+from sqlalchemy.dialects.postgresql.base import PGCompiler, PGDialect
+from sqlalchemy.util import KeyedTuple
+
+
+class AsyncpgCompiler(PGCompiler):
+    # asyncpg takes numbered $1, $2, ... placeholders.
+    def bindparam_string(self, name, **kw):
+        return '$' + super(AsyncpgCompiler, self).bindparam_string(name, **kw)[1:]
+
+
+class AsyncpgDialect(PGDialect):
+    statement_compiler = AsyncpgCompiler
+    # The dialect is never connected, so it would keep assuming that the
+    # server does not have standard_conforming_strings on (the default since
+    # PostgreSQL 9.1) and double the backslashes of literals like ESCAPE '\\'.
+    _backslash_escapes = False
+
+    def __init__(self, **kwargs):
+        super(AsyncpgDialect, self).__init__(paramstyle='numeric', **kwargs)
+
+
+class AsyncDatabase(object):
+    """Runs SQLAlchemy statements on an asyncpg connection pool.
+
+    Statements (Core selects or unexecuted ORM queries built against the
+    models in models.py) are compiled for PostgreSQL and their rows come
+    back as keyed tuples, like the rows of a column-based ORM query, so the
+    sync views' row-shaping helpers work on them unchanged.
+
+    asyncpg caches a named prepared statement per query on each connection.
+    Behind PgBouncer in transaction pooling mode, the next use may land on
+    another server connection that lacks it, so pass
+    ``statement_cache_size=0`` there.
+    """
+
+    def __init__(self, dsn, min_size=2, max_size=20, timeout=30, statement_cache_size=100):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.statement_cache_size = statement_cache_size
+        self.dialect = AsyncpgDialect()
+        self.pool = None
+
+    async def connect(self):
+        self.pool = await asyncpg.create_pool(self.dsn, min_size=self.min_size,
+                                              max_size=self.max_size, timeout=self.timeout,
+                                              statement_cache_size=self.statement_cache_size)
+
+    async def close(self):
+        await self.pool.close()
+
+    def compile(self, statement):
+        statement = getattr(statement, 'statement', statement)
+        compiled = statement.compile(dialect=self.dialect)
+        params = compiled.construct_params()
+        return compiled.string, [params[name] for name in compiled.positiontup]
+
+    async def all(self, statement):
+        sql, args = self.compile(statement)
+        async with self.pool.acquire() as connection:
+            records = await connection.fetch(sql, *args)
+        return [KeyedTuple(tuple(record.values()), list(record.keys())) for record in records]
+
+    async def first(self, statement):
+        rows = await self.all(statement)
+        return rows[0] if rows else None
+
+    def stats(self):
+        return {'size': self.pool.get_size(), 'idle': self.pool.get_idle_size(),
+                'max_size': self.max_size}
@@ -0,0 +1,59 @@
+"""Compare the CSS and JavaScript a first page view downloads.
+
+Renders the home page once with the individual source files and once with
+the bundles from `flask assets build` (built here if needed), requests
+every local stylesheet and script the page references with
+`Accept-Encoding: br, gzip`, and reports the number of requests and the
+bytes transferred. Third-party scripts are not counted.
+
+Usage:
+    python benchmarks/asset_bytes.py
+"""
+import argparse
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import assets, create_app
+
+app = create_app()
+
+ASSET_URL = re.compile(r'<(?:link[^>]+href|script[^>]+src)="(/static/[^"]+\.(?:css|js))"')
+
+
+def first_view(encoding):
+  client = app.test_client()
+  page = client.get('/').get_data(as_text=True)
+  # Conditional comments only apply to old Internet Explorer.
+  page = re.sub(r'<!--\[if.*?<!\[endif\]-->', '', page, flags=re.S)
+  sizes = {}
+  for url in ASSET_URL.findall(page):
+    response = client.get(url, headers={'Accept-Encoding': encoding})
+    sizes[url] = (len(response.get_data()), response.content_encoding or 'identity')
+  return sizes
+
+
+def report(label, sizes):
+  print('=== %s: %d requests, %d bytes' % (label, len(sizes), sum(
+    size for size, _ in sizes.values())))
+  for url, (size, encoding) in sorted(sizes.items()):
+    print('    %8d  %-8s %s' % (size, encoding, url))
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--encoding', default='br, gzip',
+                      help='Accept-Encoding header of the asset requests.')
+  args = parser.parse_args()
+
+  manifest = assets.manifest or assets.build()
+  assets.manifest = {}
+  report('Source files', first_view(args.encoding))
+  assets.manifest = manifest
+  report('Bundles', first_view(args.encoding))
+
+
+if __name__ == '__main__':
+  main()
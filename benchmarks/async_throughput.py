@@ -0,0 +1,204 @@
+"""Compare the throughput of the sync and async serving modes.
+
+Starts the Flask app (Werkzeug's threaded server, with at most --threads
+requests in progress at once, like a fixed pool of worker threads) and
+async_app.py (Hypercorn, one process) side by side, then fires the same mix
+of read-only requests at each from --concurrency simultaneous clients and
+reports requests per second and latency percentiles.
+
+Both servers reach the database through a local TCP proxy that delays every
+reply by --db-latency milliseconds, standing in for a database on another
+host. The longer each query waits, the more the sync mode is bound by its
+thread count while the async mode keeps every client in flight.
+
+Usage:
+    python benchmarks/async_throughput.py --concurrency 200 --requests 4000 --db-latency 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import config
+
+PATHS = ['/venues', '/artists', '/shows', '/api/v1/shows']
+
+# Runs the Flask app with a cap on the requests in progress at once.
+SYNC_SERVER = '''
+import sys, threading
+from werkzeug.serving import run_simple
+from app import create_app
+
+app = create_app()
+
+slots = threading.BoundedSemaphore(int(sys.argv[2]))
+
+def limited(environ, start_response):
+  with slots:
+    return list(app.wsgi_app(environ, start_response))
+
+app.logger.disabled = True
+run_simple('127.0.0.1', int(sys.argv[1]), limited, threaded=True)
+'''
+
+
+class LatencyProxy(object):
+  """Forwards TCP connections to PostgreSQL, delaying each reply."""
+
+  def __init__(self, upstream, delay):
+    self.upstream = upstream
+    self.delay = delay
+    self.loop = asyncio.new_event_loop()
+    self.port = None
+
+  def start(self):
+    server = self.loop.run_until_complete(
+      asyncio.start_server(self.handle, '127.0.0.1', 0))
+    self.port = server.sockets[0].getsockname()[1]
+    threading.Thread(target=self.loop.run_forever, daemon=True).start()
+
+  async def open_upstream(self):
+    host, port = self.upstream
+    if host.startswith('/'):
+      return await asyncio.open_unix_connection(os.path.join(host, '.s.PGSQL.%d' % port))
+    return await asyncio.open_connection(host, port)
+
+  async def handle(self, client_reader, client_writer):
+    server_reader, server_writer = await self.open_upstream()
+    await asyncio.gather(self.pipe(client_reader, server_writer, 0),
+                         self.pipe(server_reader, client_writer, self.delay))
+
+  async def pipe(self, reader, writer, delay):
+    try:
+      while True:
+        data = await reader.read(65536)
+        if not data:
+          break
+        if delay:
+          await asyncio.sleep(delay)
+        writer.write(data)
+        await writer.drain()
+    except ConnectionError:
+      pass
+    finally:
+      writer.close()
+
+
+def proxied_url(url, port):
+  # Point the database URL at the proxy and return the real target.
+  parts = urlsplit(url)
+  query = dict(parse_qsl(parts.query))
+  host = query.pop('host', None) or parts.hostname or '/var/run/postgresql'
+  upstream = (host, query.pop('port', None) or parts.port or 5432)
+  userinfo = parts.netloc.rpartition('@')[0]
+  netloc = (userinfo + '@' if userinfo else '') + '127.0.0.1:%d' % port
+  url = urlunsplit((parts.scheme, netloc, parts.path, urlencode(query), ''))
+  return url, (upstream[0], int(upstream[1]))
+
+
+def wait_for(port, timeout=30):
+  deadline = time.time() + timeout
+  while time.time() < deadline:
+    try:
+      asyncio.run(fetch(port, '/'))
+      return
+    except OSError:
+      time.sleep(0.2)
+  raise RuntimeError('Server on port %d did not start' % port)
+
+
+async def fetch(port, path):
+  reader, writer = await asyncio.open_connection('127.0.0.1', port)
+  writer.write(('GET %s HTTP/1.0\r\nHost: localhost\r\n\r\n' % path).encode('ascii'))
+  await writer.drain()
+  response = await reader.read()
+  writer.close()
+  status = int(response.split(b' ', 2)[1])
+  if status != 200:
+    raise RuntimeError('GET %s returned %d' % (path, status))
+
+
+async def load(port, concurrency, total):
+  latencies = []
+  queue = asyncio.Queue()
+  for number in range(total):
+    queue.put_nowait(PATHS[number % len(PATHS)])
+
+  async def client():
+    while not queue.empty():
+      path = queue.get_nowait()
+      started = time.perf_counter()
+      await fetch(port, path)
+      latencies.append(time.perf_counter() - started)
+
+  started = time.perf_counter()
+  await asyncio.gather(*[client() for _ in range(concurrency)])
+  return time.perf_counter() - started, latencies
+
+
+def percentile(values, fraction):
+  values = sorted(values)
+  return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def measure(name, port, args):
+  asyncio.run(load(port, args.concurrency, len(PATHS) * 5))  # warm up
+  elapsed, latencies = asyncio.run(load(port, args.concurrency, args.requests))
+  result = {
+    'mode': name,
+    'requests': len(latencies),
+    'requests_per_second': round(len(latencies) / elapsed, 1),
+    'p50_ms': round(statistics.median(latencies) * 1000, 1),
+    'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+    'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+  }
+  print(json.dumps(result))
+  return result
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+  parser.add_argument('--concurrency', type=int, default=200)
+  parser.add_argument('--requests', type=int, default=4000)
+  parser.add_argument('--db-latency', type=float, default=5.0,
+                      help='Milliseconds added to every database reply.')
+  parser.add_argument('--threads', type=int, default=config.DB_POOL_SIZE + config.DB_MAX_OVERFLOW,
+                      help='Requests the sync server handles at once.')
+  parser.add_argument('--sync-port', type=int, default=5101)
+  parser.add_argument('--async-port', type=int, default=5102)
+  args = parser.parse_args()
+
+  proxy = LatencyProxy(None, args.db_latency / 1000.0)
+  proxy.start()
+  env = dict(os.environ)
+  env['DATABASE_URL'], proxy.upstream = proxied_url(config.SQLALCHEMY_DATABASE_URI, proxy.port)
+  env['ASYNC_DB_POOL_MAX_SIZE'] = str(max(args.threads, config.ASYNC_DB_POOL_MAX_SIZE))
+
+  servers = [
+    ('sync', args.sync_port, [sys.executable, '-c', SYNC_SERVER, str(args.sync_port),
+                              str(args.threads)]),
+    ('async', args.async_port, [sys.executable, '-m', 'hypercorn', '--bind',
+                                '127.0.0.1:%d' % args.async_port, 'async_app:app']),
+  ]
+  for name, port, command in servers:
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+    try:
+      wait_for(port)
+      measure(name, port, args)
+    finally:
+      process.terminate()
+      process.wait()
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,138 @@
+"""Show that calendar window queries read only the slice of Show they need.
+
+Seeds a large Show table inside a single transaction, appending shows in
+roughly start_time order (each one up to --jitter days off), the way a
+live schedule grows. For a weekend, a week and a month, with and without
+a city, it reports how many rows the calendar's page and day-count
+queries return, how many buffers they touch (page accesses, which can
+exceed the table's size when pages are revisited) as a share of the
+table's pages, and which indexes they use. This is repeated with all
+indexes, with the BRIN index on start_time as the only Show index, and
+with no Show indexes at all. Everything is rolled back at the end, so
+the target database is left as it was.
+
+Usage:
+    python benchmarks/calendar_window.py --shows 1000000 --venues 2000 --artists 5000
+"""
+import argparse
+import os
+import re
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import calendar_criteria, calendar_days_query, create_app, show_listing_query
+from models import db
+from show_indexes import seed as seed_entities
+
+BTREE_INDEXES = ['ix_Show_start_time_show_id', 'ix_Show_venue_id_start_time',
+                 'ix_Show_artist_id_start_time', 'ix_Show_venue_id_period',
+                 'ix_Show_artist_id_period']
+BRIN_INDEX = 'ix_Show_start_time_brin'
+
+WINDOWS = [('weekend', 2), ('week', 7), ('month', 30)]
+
+
+def add_shows(cursor, venue_id, venues, artist_id, artists, shows, days, jitter):
+  # Show g starts g/shows of the way through `days` days from a year ago.
+  cursor.execute('INSERT INTO "Show" (venue_id, artist_id, start_time) '
+                 'SELECT %s + floor(random() * %s)::int, %s + floor(random() * %s)::int, '
+                 "date_trunc('day', localtimestamp) - interval '365 days' "
+                 "+ (g::float / %s * %s + random() * %s) * interval '1 day' "
+                 'FROM generate_series(1, %s) g',
+                 (venue_id, venues, artist_id, artists, shows, days, jitter, shows))
+
+
+def explain(cursor, query):
+  compiled = query.statement.compile(dialect=db.engine.dialect)
+  cursor.execute('EXPLAIN (ANALYZE, BUFFERS, FORMAT TEXT) ' + str(compiled), compiled.params)
+  return [row[0] for row in cursor.fetchall()]
+
+
+def plan_summary(plan):
+  # Rows returned, buffers touched by the whole plan, and the scans used.
+  rows = int(re.search(r'actual time=\S+ rows=(\d+)', plan[0]).group(1))
+  buffers = 0
+  for line in plan:
+    match = re.search(r'Buffers: shared(?: hit=(\d+))?(?: read=(\d+))?', line)
+    if match:
+      buffers = sum(int(value or 0) for value in match.groups())
+      break
+  scans = []
+  for line in plan:
+    match = re.search(r'(Seq Scan) on "Show"|Index (?:Only )?Scan using "?(ix_Show\w+)'
+                      r'|Bitmap Index Scan on "?(ix_Show\w+)', line)
+    scan = match and next(group for group in match.groups() if group)
+    if scan and scan not in scans:
+      scans.append(scan)
+  return rows, buffers, scans
+
+
+def measure(cursor, label, city, show_pages):
+  start = datetime.combine(datetime.now().date(), datetime.min.time()) + timedelta(days=30)
+  print('\n=== %s' % label)
+  print('%-8s %-6s %-5s %7s %8s %8s  %s' % ('window', 'query', 'city', 'rows', 'buffers',
+                                          '% table', 'Show scans'))
+  for name, days in WINDOWS:
+    for with_city in (False, True):
+      filters = {'start': start, 'end': start + timedelta(days=days),
+                 'city': city if with_city else None, 'state': None, 'genre': None}
+      criteria = calendar_criteria(filters)
+      for query_name, query in (('page', show_listing_query(None, None, *criteria)),
+                                ('days', calendar_days_query(filters))):
+        rows, buffers, scans = plan_summary(explain(cursor, query))
+        print('%-8s %-6s %-5s %7d %8d %7.2f%%  %s' % (
+          name, query_name, 'yes' if with_city else 'no', rows, buffers,
+          100.0 * buffers / show_pages, ', '.join(scans)))
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--venues', type=int, default=2000)
+  parser.add_argument('--artists', type=int, default=5000)
+  parser.add_argument('--shows', type=int, default=1000000)
+  parser.add_argument('--days', type=int, default=730, help='Days the schedule spans.')
+  parser.add_argument('--jitter', type=float, default=3.0,
+                      help='Most days a show starts later than its place in the order.')
+  args = parser.parse_args()
+
+  with create_app().app_context():
+    connection = db.engine.connect()
+    transaction = connection.begin()
+    db.session.configure(bind=connection, binds={})
+    try:
+      cursor = connection.connection.cursor()
+      print('Seeding %d shows...' % args.shows)
+      venue_id, artist_id = seed_entities(cursor, args.venues, args.artists, 0)
+      add_shows(cursor, venue_id, args.venues, artist_id, args.artists, args.shows, args.days,
+                args.jitter)
+      cursor.execute('ANALYZE "Venue"; ANALYZE "Artist"; ANALYZE "Show"')
+      # Autovacuum summarizes the new page ranges after the fact; it does
+      # not run inside this transaction.
+      cursor.execute('SELECT brin_summarize_new_values(%s)', ('"%s"' % BRIN_INDEX,))
+      cursor.execute('SELECT city FROM "Venue" WHERE id = %s', (venue_id,))
+      city = cursor.fetchone()[0]
+      cursor.execute('SELECT pg_relation_size(\'"Show"\') / current_setting(\'block_size\')::int')
+      show_pages = cursor.fetchone()[0]
+      cursor.execute("SELECT correlation FROM pg_stats WHERE tablename = 'Show' "
+                     "AND attname = 'start_time'")
+      print('Show: %d pages, start_time correlation %.3f' % (show_pages, cursor.fetchone()[0]))
+      for name in BTREE_INDEXES + [BRIN_INDEX]:
+        cursor.execute('SELECT pg_size_pretty(pg_relation_size(%s))', ('"%s"' % name,))
+        print('  %-30s %s' % (name, cursor.fetchone()[0]))
+
+      measure(cursor, 'All indexes', city, show_pages)
+      for name in BTREE_INDEXES:
+        cursor.execute('DROP INDEX IF EXISTS "%s"' % name)
+      measure(cursor, 'BRIN index on start_time only', city, show_pages)
+      cursor.execute('DROP INDEX IF EXISTS "%s"' % BRIN_INDEX)
+      measure(cursor, 'No Show indexes', city, show_pages)
+    finally:
+      db.session.remove()
+      transaction.rollback()
+      connection.close()
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,117 @@
+"""Show that the show conflict check stays fast as the schedule grows.
+
+Grows a Show table inside a single transaction to each size in --sizes,
+and after each step times ShowScheduler.conflicts() on batches of --slots
+proposed slots and reports the buffers its query touched, from EXPLAIN
+(ANALYZE, BUFFERS). With the per-venue and per-artist indexes on Show
+both stay nearly flat; --without-indexes drops them for comparison. The
+plan at the largest size is printed at the end. Everything is rolled
+back, so the target database is left as it was.
+
+Usage:
+    python benchmarks/conflict_check.py --sizes 10000,100000,1000000 --slots 20
+"""
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, scheduler
+from models import db
+from scheduling import CONFLICTS, Slot
+from show_indexes import seed as seed_entities
+
+# The indexes the probes can use: the GiST period indexes, and the btree
+# start_time indexes the probes' start_time bounds also fit.
+PROBE_INDEXES = ['ix_Show_venue_id_period', 'ix_Show_artist_id_period',
+                 'ix_Show_venue_id_start_time', 'ix_Show_artist_id_start_time']
+
+
+def add_shows(cursor, venue_id, venues, artist_id, artists, shows):
+  # Spread over two years around now, like show_indexes.seed().
+  cursor.execute('INSERT INTO "Show" (venue_id, artist_id, start_time, duration_minutes) '
+                 'SELECT %s + floor(random() * %s)::int, %s + floor(random() * %s)::int, '
+                 "now() + (random() * 730 - 365) * interval '1 day', "
+                 '60 + floor(random() * 4)::int * 30 '
+                 'FROM generate_series(1, %s)',
+                 (venue_id, venues, artist_id, artists, shows))
+
+
+def proposed_slots(rng, count, venue_id, venues, artist_id, artists):
+  now = datetime.now()
+  return [Slot(venue_id + rng.randrange(venues), artist_id + rng.randrange(artists),
+               now + timedelta(minutes=rng.randrange(-365 * 24 * 60, 365 * 24 * 60)),
+               rng.choice([60, 90, 120])) for _ in range(count)]
+
+
+def explain(cursor, slots):
+  compiled = CONFLICTS.compile(dialect=db.engine.dialect)
+  cursor.execute('EXPLAIN (ANALYZE, BUFFERS) ' + str(compiled), scheduler.conflicts_params(slots))
+  return [row[0] for row in cursor.fetchall()]
+
+
+def buffers(plan):
+  # The top node's counts include every node below it.
+  for line in plan:
+    match = re.search(r'Buffers: shared(?: hit=(\d+))?(?: read=(\d+))?', line)
+    if match:
+      return sum(int(value or 0) for value in match.groups())
+  return 0
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--sizes', default='10000,100000,1000000',
+                      help='Comma-separated Show table sizes to measure at.')
+  parser.add_argument('--venues', type=int, default=2000)
+  parser.add_argument('--artists', type=int, default=5000)
+  parser.add_argument('--slots', type=int, default=20, help='Proposed slots per check.')
+  parser.add_argument('--repeat', type=int, default=20)
+  parser.add_argument('--without-indexes', action='store_true',
+                      help='Drop the per-venue and per-artist Show indexes first.')
+  args = parser.parse_args()
+
+  rng = random.Random(0)
+  with create_app().app_context():
+    connection = db.engine.connect()
+    transaction = connection.begin()
+    db.session.configure(bind=connection, binds={})
+    try:
+      cursor = connection.connection.cursor()
+      venue_id, artist_id = seed_entities(cursor, args.venues, args.artists, 0)
+      if args.without_indexes:
+        for name in PROBE_INDEXES:
+          cursor.execute('DROP INDEX IF EXISTS "%s"' % name)
+      print('%10s %10s %10s %9s' % ('shows', 'median ms', 'min ms', 'buffers'))
+      size = 0
+      for target in [int(size) for size in args.sizes.split(',')]:
+        add_shows(cursor, venue_id, args.venues, artist_id, args.artists, target - size)
+        size = target
+        cursor.execute('ANALYZE "Show"')
+        batches = [proposed_slots(rng, args.slots, venue_id, args.venues, artist_id,
+                                  args.artists) for _ in range(args.repeat)]
+        timings = []
+        for slots in batches:
+          started = time.perf_counter()
+          scheduler.conflicts(slots)
+          timings.append((time.perf_counter() - started) * 1000)
+        plan = explain(cursor, batches[0])
+        print('%10d %10.2f %10.2f %9d' % (size, statistics.median(timings), min(timings),
+                                          buffers(plan)))
+      print('\nPlan at %d shows:' % size)
+      for line in plan:
+        print('    ' + line)
+    finally:
+      db.session.remove()
+      transaction.rollback()
+      connection.close()
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,388 @@
+"""Load-test every route of app.py and save the results as JSON.
+
+Worker threads send a weighted mix of requests covering every route to the
+app in-process, each through its own Flask test client, so the numbers
+measure the views, queries and templates rather than an HTTP server.
+Venue and artist pages are requested mostly for the hottest entities, like
+real traffic on data from benchmarks/seed.py. Form submissions that write
+are only sent with --writes; they create, edit and delete rows.
+
+Latency percentiles (p50/p95/p99) and throughput are reported per route and
+overall, and saved with the commit and dataset size to a JSON file in
+--output. --compare prints the changes between two saved runs.
+
+Usage:
+    python benchmarks/seed.py --truncate
+    python benchmarks/load_test.py --duration 30 --concurrency 8
+    python benchmarks/load_test.py --compare benchmarks/results/BASE.json benchmarks/results/NEW.json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app import assets, create_app
+from choices import genre_choices, state_choices
+from models import db, Venue, Artist, Show, VenueSummary, ArtistSummary
+from seed import CITIES
+
+SEARCH_TERMS = ['blue', 'hall', 'new york', 'TX', 'jazz', 'the', 'royal lounge', 'zz']
+
+
+class Traffic(object):
+  """Picks the ids and form data of the requests to `app`."""
+
+  def __init__(self, app, hot, writes, deletable):
+    self.app = app
+    with app.app_context():
+      self.venue_ids = self.ids(Venue.id, VenueSummary, VenueSummary.venue_id, hot)
+      self.artist_ids = self.ids(Artist.id, ArtistSummary, ArtistSummary.artist_id, hot)
+      if not self.venue_ids[0] or not self.artist_ids[0]:
+        sys.exit('No venues or artists to request; run benchmarks/seed.py first.')
+      self.venue = Venue.query.get(self.venue_ids[0][0])
+      self.artist = Artist.query.get(self.artist_ids[0][0])
+      db.session.expunge_all()
+    self.cursors = self.past_show_cursors()
+    self.writes = writes
+    self.deletable = {'venue': [], 'artist': []}
+    if writes:
+      self.deletable = self.create_deletable(deletable)
+    self.lock = threading.Lock()
+
+  def ids(self, key, summary, summary_key, hot):
+    # The `hot` entities with the most upcoming shows, and all of them.
+    query = db.session.query(key).outerjoin(summary, summary_key == key)
+    ordered = [id for id, in query.order_by(
+      summary.upcoming_shows_count.desc().nullslast(), key)]
+    return ordered[:hot], ordered
+
+  def pick(self, rng, ids):
+    hot, everything = ids
+    return rng.choice(hot if rng.random() < 0.8 else everything)
+
+  def past_show_cursors(self):
+    # Cursors of the second page of past shows of the hottest entities.
+    client = self.app.test_client()
+    cursors = {'venue': [], 'artist': []}
+    for kind, (hot, _) in (('venue', self.venue_ids), ('artist', self.artist_ids)):
+      for entity_id in hot[:20]:
+        data = client.get('/api/v1/%ss/%d' % (kind, entity_id)).get_json()
+        if data['past_shows_cursor']:
+          cursors[kind].append((entity_id, data['past_shows_cursor']))
+    return cursors
+
+  def create_deletable(self, count):
+    # Entities without shows for the delete routes to remove.
+    created = {'venue': [], 'artist': []}
+    with self.app.app_context():
+      for number in range(count):
+        venue = Venue(name='Load test venue %d' % number, city='Nowhere', state='CA',
+                      genres=['Other'])
+        artist = Artist(name='Load test artist %d' % number, city='Nowhere', state='CA',
+                        genres=['Other'])
+        db.session.add_all([venue, artist])
+        db.session.flush()
+        created['venue'].append(venue.id)
+        created['artist'].append(artist.id)
+      db.session.commit()
+    return created
+
+  def past_shows(self, rng, kind):
+    if not self.cursors[kind]:
+      return None
+    return rng.choice(self.cursors[kind])
+
+  def take_deletable(self, kind):
+    with self.lock:
+      return self.deletable[kind].pop() if self.deletable[kind] else None
+
+  def venue_form(self):
+    venue = self.venue
+    return {'name': venue.name, 'city': venue.city, 'state': venue.state,
+            'address': venue.address, 'phone': venue.phone, 'genres': venue.genres or [],
+            'website': venue.website or '', 'image_link': venue.image_link or '',
+            'facebook_link': venue.facebook_link or '',
+            'seeking_talent': 'y' if venue.seeking_talent else '',
+            'seeking_description': venue.seeking_description or ''}
+
+  def artist_form(self):
+    artist = self.artist
+    return {'name': artist.name, 'city': artist.city, 'state': artist.state,
+            'phone': artist.phone, 'genres': artist.genres or [],
+            'website': artist.website or '', 'image_link': artist.image_link or '',
+            'facebook_link': artist.facebook_link or '',
+            'seeking_venue': 'y' if artist.seeking_venue else '',
+            'seeking_description': artist.seeking_description or ''}
+
+
+def read_routes(traffic):
+  # endpoint: (weight, build), where build(rng) returns the method, the
+  # path and the form data of one request, or None to skip it.
+  venue = lambda rng: traffic.pick(rng, traffic.venue_ids)
+  artist = lambda rng: traffic.pick(rng, traffic.artist_ids)
+  genres = [genre for genre, _ in genre_choices]
+  states = [state for state, _ in state_choices]
+
+  def past_shows(kind, prefix):
+    def build(rng):
+      picked = traffic.past_shows(rng, kind)
+      return picked and ('GET', '%s/%ss/%d/past_shows?before=%s' % (
+        prefix, kind, picked[0], picked[1]), None)
+    return build
+
+  def calendar(path):
+    # A weekend in one of the seeded cities, sometimes of one genre.
+    def build(rng):
+      city, state = rng.choice(CITIES)
+      saturday = datetime.now().date() + timedelta(days=rng.randint(0, 60))
+      saturday += timedelta(days=(5 - saturday.weekday()) % 7)
+      return ('GET', path + '?' + urlencode({
+        'start': saturday.isoformat(), 'end': (saturday + timedelta(days=1)).isoformat(),
+        'city': city, 'state': state, 'genre': rng.choice(genres + [''] * 3)}), None)
+    return build
+
+  def proposed_slots(rng):
+    # A promoter checking a tour: one artist at several venues.
+    artist_id = artist(rng)
+    return json.dumps({'slots': [{
+      'venue_id': venue(rng), 'artist_id': artist_id,
+      'start_time': (datetime.now() + timedelta(days=rng.randint(1, 365))).strftime(
+        '%Y-%m-%d 20:00'),
+      'duration_minutes': rng.choice([60, 90, 120, 180])} for _ in range(10)]})
+
+  return {
+    'index': (2, lambda rng: ('GET', '/', None)),
+    'static': (2, lambda rng: ('GET', '/static/css/main.css', None)),
+    'asset_bundle': (2, lambda rng: assets.manifest and (
+      'GET', assets.urls(rng.choice(sorted(assets.manifest)))[0], None)),
+    'venues': (6, lambda rng: ('GET', '/venues', None)),
+    'artists': (6, lambda rng: ('GET', '/artists', None)),
+    'shows': (6, lambda rng: ('GET', '/shows', None)),
+    'calendar_shows': (3, calendar('/shows/calendar')),
+    'api_calendar_shows': (2, calendar('/api/v1/shows/calendar')),
+    'browse_shows': (3, lambda rng: ('GET', '/shows/browse?' + urlencode({
+      'genre': rng.choice(genres), 'state': rng.choice(states + [''])}), None)),
+    'search_venues': (4, lambda rng: ('POST', '/venues/search', {
+      'search_term': rng.choice(SEARCH_TERMS)})),
+    'search_artists': (4, lambda rng: ('POST', '/artists/search', {
+      'search_term': rng.choice(SEARCH_TERMS)})),
+    'show_venue': (10, lambda rng: ('GET', '/venues/%d' % venue(rng), None)),
+    'show_artist': (10, lambda rng: ('GET', '/artists/%d' % artist(rng), None)),
+    'venue_past_shows': (2, past_shows('venue', '')),
+    'artist_past_shows': (2, past_shows('artist', '')),
+    'api_venue': (4, lambda rng: ('GET', '/api/v1/venues/%d' % venue(rng), None)),
+    'api_artist': (4, lambda rng: ('GET', '/api/v1/artists/%d' % artist(rng), None)),
+    'api_shows': (3, lambda rng: ('GET', '/api/v1/shows', None)),
+    'api_venue_past_shows': (1, past_shows('venue', '/api/v1')),
+    'api_artist_past_shows': (1, past_shows('artist', '/api/v1')),
+    'check_show_conflicts': (2, lambda rng: ('POST', '/api/v1/shows/conflicts',
+                                             proposed_slots(rng))),
+    'edit_venue': (1, lambda rng: ('GET', '/venues/%d/edit' % venue(rng), None)),
+    'edit_artist': (1, lambda rng: ('GET', '/artists/%d/edit' % artist(rng), None)),
+    'create_venue_form': (1, lambda rng: ('GET', '/venues/create', None)),
+    'create_artist_form': (1, lambda rng: ('GET', '/artists/create', None)),
+    'create_shows': (1, lambda rng: ('GET', '/shows/create', None)),
+    # A full dump of venues, and the shows changed since the run started.
+    'export': (0.2, lambda rng: ('GET', rng.choice([
+      '/export/venues', '/export/shows?since=%s' % STARTED.isoformat()]), None)),
+    'cache_stats': (0.5, lambda rng: ('GET', '/cache/stats', None)),
+    'prometheus_metrics': (0.5, lambda rng: ('GET', '/metrics', None)),
+    'connection_pool_stats': (0.5, lambda rng: ('GET', '/pool/stats', None)),
+  }
+
+
+def write_routes(traffic):
+  def delete(kind, method):
+    def build(rng):
+      entity_id = traffic.take_deletable(kind)
+      return entity_id and (method, '/%ss/%d' % (kind, entity_id), None)
+    return build
+
+  def new_show(rng):
+    return ('POST', '/shows/create', {
+      'venue_id': traffic.pick(rng, traffic.venue_ids),
+      'artist_id': traffic.pick(rng, traffic.artist_ids),
+      'start_time': (datetime.now() + timedelta(days=rng.randint(1, 365))).strftime(
+        '%Y-%m-%d 20:00')})
+
+  return {
+    'create_venue_submission': (0.5, lambda rng: ('POST', '/venues/create', dict(
+      traffic.venue_form(), name='Load test venue'))),
+    'create_artist_submission': (0.5, lambda rng: ('POST', '/artists/create', dict(
+      traffic.artist_form(), name='Load test artist'))),
+    'create_show_submission': (1, new_show),
+    # Edits save the current values again.
+    'edit_venue_submission': (0.5, lambda rng: ('POST', '/venues/%d/edit' % traffic.venue.id,
+                                                traffic.venue_form())),
+    'edit_artist_submission': (0.5, lambda rng: (
+      'POST', '/artists/%d/edit' % traffic.artist.id, traffic.artist_form())),
+    'delete_venue': (0.2, delete('venue', 'DELETE')),
+    'delete_artist': (0.2, delete('artist', 'POST')),
+  }
+
+
+STARTED = datetime.utcnow()
+
+
+def worker(app, routes, seed, deadline, samples):
+  rng = random.Random(seed)
+  client = app.test_client()
+  endpoints = list(routes)
+  weights = [routes[endpoint][0] for endpoint in endpoints]
+  while time.perf_counter() < deadline:
+    endpoint = rng.choices(endpoints, weights)[0]
+    request = routes[endpoint][1](rng)
+    if request is None:
+      continue
+    method, path, data = request
+    started = time.perf_counter()
+    try:
+      response = client.open(path, method=method, data=data)
+      response.get_data()
+      status = response.status_code
+    except Exception:
+      status = 'exception'
+    samples.append((endpoint, time.perf_counter() - started, status))
+
+
+def percentile(values, fraction):
+  values = sorted(values)
+  return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def summarize(samples, elapsed):
+  latencies = [seconds for _, seconds, _ in samples]
+  errors = [status for _, _, status in samples
+            if status == 'exception' or status >= 400]
+  return {
+    'requests': len(samples),
+    'errors': len(errors),
+    'requests_per_second': round(len(samples) / elapsed, 2),
+    'mean_ms': round(statistics.mean(latencies) * 1000, 2),
+    'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+    'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+    'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+  }
+
+
+def git_commit():
+  try:
+    commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT)
+    dirty = subprocess.call(['git', 'diff', '--quiet', 'HEAD'], cwd=ROOT)
+  except (OSError, subprocess.CalledProcessError):
+    return 'unknown'
+  return commit.decode().strip() + ('-dirty' if dirty else '')
+
+
+def dataset(app):
+  with app.app_context():
+    return {'venues': Venue.query.count(), 'artists': Artist.query.count(),
+            'shows': Show.query.count()}
+
+
+def run(args):
+  app = create_app()
+  traffic = Traffic(app, args.hot, args.writes, args.deletable)
+  routes = read_routes(traffic)
+  if args.writes:
+    routes.update(write_routes(traffic))
+  skipped = sorted(set(app.view_functions) - set(routes))
+  if skipped:
+    print('Not requested: %s' % ', '.join(skipped))
+
+  samples = []
+  deadline = time.perf_counter() + args.warmup
+  worker(app, routes, args.seed, deadline, [])
+  started = time.perf_counter()
+  threads = [threading.Thread(target=worker, args=(app, routes, args.seed + number,
+                                                    started + args.duration, samples))
+             for number in range(args.concurrency)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  elapsed = time.perf_counter() - started
+
+  by_route = {}
+  for sample in samples:
+    by_route.setdefault(sample[0], []).append(sample)
+  result = {
+    'commit': git_commit(),
+    'started_at': STARTED.isoformat(),
+    'duration_seconds': round(elapsed, 2),
+    'concurrency': args.concurrency,
+    'writes': args.writes,
+    'dataset': dataset(app),
+    'total': summarize(samples, elapsed),
+    'routes': {endpoint: summarize(by_route[endpoint], elapsed)
+               for endpoint in sorted(by_route)},
+  }
+
+  print('%-26s %8s %7s %9s %9s %9s' % ('route', 'requests', 'errors', 'p50 ms', 'p95 ms',
+                                        'p99 ms'))
+  for endpoint, stats in sorted(result['routes'].items()) + [('TOTAL', result['total'])]:
+    print('%-26s %8d %7d %9.2f %9.2f %9.2f' % (endpoint, stats['requests'], stats['errors'],
+                                               stats['p50_ms'], stats['p95_ms'], stats['p99_ms']))
+  print('%.1f requests/s' % result['total']['requests_per_second'])
+
+  os.makedirs(args.output, exist_ok=True)
+  path = os.path.join(args.output, '%s-%s.json' % (
+    STARTED.strftime('%Y%m%d-%H%M%S'), result['commit']))
+  with open(path, 'w') as output:
+    json.dump(result, output, indent=2, sort_keys=True)
+  print('Saved %s' % path)
+
+
+def compare(base_path, new_path):
+  with open(base_path) as base_file, open(new_path) as new_file:
+    base, new = json.load(base_file), json.load(new_file)
+  print('%s (%s) -> %s (%s)' % (base_path, base['commit'], new_path, new['commit']))
+  print('%-26s %10s %10s %8s %10s %10s' % ('route', 'base p95', 'new p95', 'change',
+                                           'base rps', 'new rps'))
+  rows = [(endpoint, base['routes'].get(endpoint), new['routes'].get(endpoint))
+          for endpoint in sorted(set(base['routes']) | set(new['routes']))]
+  for endpoint, old, current in rows + [('TOTAL', base['total'], new['total'])]:
+    if old is None or current is None:
+      print('%-26s %s' % (endpoint, 'only in ' + ('new' if old is None else 'base')))
+      continue
+    change = (current['p95_ms'] / old['p95_ms'] - 1) * 100 if old['p95_ms'] else 0
+    print('%-26s %10.2f %10.2f %+7.1f%% %10.2f %10.2f' % (
+      endpoint, old['p95_ms'], current['p95_ms'], change, old['requests_per_second'],
+      current['requests_per_second']))
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--duration', type=float, default=30, help='Seconds to run for.')
+  parser.add_argument('--warmup', type=float, default=3,
+                      help='Seconds of requests before measuring.')
+  parser.add_argument('--concurrency', type=int, default=8, help='Worker threads.')
+  parser.add_argument('--hot', type=int, default=50,
+                      help='Venues and artists that get 80%% of the detail requests.')
+  parser.add_argument('--writes', action='store_true',
+                      help='Also submit the create, edit and delete forms.')
+  parser.add_argument('--deletable', type=int, default=200,
+                      help='Venues and artists created for the delete routes.')
+  parser.add_argument('--seed', type=int, default=1, help='Seed of the request mix.')
+  parser.add_argument('--output', default=os.path.join(ROOT, 'benchmarks', 'results'))
+  parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'),
+                      help='Compare two saved runs instead of running.')
+  args = parser.parse_args()
+  if args.compare:
+    compare(*args.compare)
+  else:
+    run(args)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,131 @@
+"""Fill the database with synthetic venues, artists and shows.
+
+Venues and artists get names, cities, genres and links drawn from small
+word lists. Bookings are skewed like real ones: a few hot venues host most
+of the shows and a few prolific artists play most of them, with the share
+controlled by --skew (1 is uniform, larger is more concentrated). Shows are
+spread over --days before and after today, in the evening. The show
+summaries and table versions are brought up to date afterwards, so the app
+serves the new rows straight away.
+
+Usage:
+    python benchmarks/seed.py --venues 2000 --artists 5000 --shows 200000 --truncate
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from app import changes, create_app, summaries
+from choices import genre_choices
+from models import db, Venue, Artist, Show
+
+CITIES = [
+  ('New York', 'NY'), ('Los Angeles', 'CA'), ('Chicago', 'IL'), ('Houston', 'TX'),
+  ('Phoenix', 'AZ'), ('Philadelphia', 'PA'), ('San Antonio', 'TX'), ('San Diego', 'CA'),
+  ('Dallas', 'TX'), ('Austin', 'TX'), ('San Francisco', 'CA'), ('Seattle', 'WA'),
+  ('Denver', 'CO'), ('Nashville', 'TN'), ('Boston', 'MA'), ('Portland', 'OR'),
+  ('Las Vegas', 'NV'), ('Detroit', 'MI'), ('Atlanta', 'GA'), ('Miami', 'FL'),
+  ('New Orleans', 'LA'), ('Minneapolis', 'MN'), ('Memphis', 'TN'), ('Baltimore', 'MD'),
+]
+WORDS = ['Blue', 'Red', 'Golden', 'Silver', 'Velvet', 'Electric', 'Midnight', 'Lucky',
+         'Wild', 'Rusty', 'Crystal', 'Neon', 'Hidden', 'Broken', 'Northern', 'Royal']
+VENUE_NOUNS = ['Room', 'Hall', 'Lounge', 'Tavern', 'Theater', 'Club', 'Garden', 'Cellar',
+               'Ballroom', 'Bar', 'Stage', 'Warehouse']
+ARTIST_NOUNS = ['Horses', 'Owls', 'Kids', 'Machines', 'Rivers', 'Wolves', 'Lights', 'Saints',
+                'Ghosts', 'Trio', 'Quartet', 'Collective']
+
+# Shared select-list pieces. `g` is the generate_series() row number; the
+# genre subquery refers to it so Postgres draws new genres for every row.
+NAME = ("(:words)[1 + floor(random() * cardinality(:words))::int] || ' ' || "
+        "(:nouns)[1 + floor(random() * cardinality(:nouns))::int] || ' ' || g")
+CITY_INDEX = '1 + floor(cardinality(:cities) * power(random(), 1.5))::int'
+GENRES = ('ARRAY(SELECT genre FROM unnest(CAST(:genres AS varchar[])) genre '
+          'WHERE g > 0 ORDER BY random() LIMIT 1 + floor(random() * 3)::int)')
+
+
+def insert_entities(table, nouns, count, extra_columns, extra_values):
+  # Insert `count` rows into "Venue" or "Artist" and return their ids.
+  sql = ('INSERT INTO "{table}" (name, city, state, genres, phone, website, image_link, '
+         'facebook_link{extra_columns}) '
+         'SELECT {name}, (:cities)[c], (:states)[c], {genres}, '
+         "lpad((100 + g % 900)::text, 3, '0') || '-555-' || lpad((g % 10000)::text, 4, '0'), "
+         "'https://example.com/' || g, 'https://picsum.photos/seed/' || g || '/300', "
+         "'https://www.facebook.com/' || g{extra_values} "
+         'FROM (SELECT g, {city} AS c FROM generate_series(1, :count) g) rows '
+         'RETURNING id').format(table=table, name=NAME, genres=GENRES, city=CITY_INDEX,
+                                extra_columns=extra_columns, extra_values=extra_values)
+  rows = db.session.execute(text(sql), {
+    'count': count, 'words': WORDS, 'nouns': nouns,
+    'genres': [genre for genre, _ in genre_choices],
+    'cities': [city for city, _ in CITIES], 'states': [state for _, state in CITIES],
+  })
+  return [row[0] for row in rows]
+
+
+def insert_shows(venue_ids, artist_ids, count, skew, days):
+  # Raising random() to the power `skew` piles the picks onto the first
+  # ids of each list, which therefore become the hot venues and artists.
+  db.session.execute(text(
+    'INSERT INTO "Show" (venue_id, artist_id, start_time) '
+    'SELECT (:venue_ids)[1 + floor(cardinality(:venue_ids) * power(random(), :skew))::int], '
+    '(:artist_ids)[1 + floor(cardinality(:artist_ids) * power(random(), :skew))::int], '
+    "date_trunc('day', localtimestamp) + (floor(random() * (2 * :days + 1)) - :days) "
+    "* interval '1 day' + (18 + floor(random() * 5)) * interval '1 hour' "
+    'FROM generate_series(1, :count)'),
+    {'venue_ids': venue_ids, 'artist_ids': artist_ids, 'skew': skew, 'days': days,
+     'count': count})
+
+
+def seed(venues, artists, shows, skew=2.0, days=365, random_seed=None, truncate=False):
+  """Insert the rows in one transaction and commit it.
+
+  Must run inside an app context. Returns the new venue and artist ids,
+  hottest first.
+  """
+  if truncate:
+    db.session.execute(text('TRUNCATE "Show", "Venue", "Artist", "VenueSummary", '
+                            '"ArtistSummary" RESTART IDENTITY CASCADE'))
+  if random_seed is not None:
+    db.session.execute(text('SELECT setseed(:seed)'), {'seed': random_seed})
+  venue_ids = insert_entities('Venue', VENUE_NOUNS, venues, ', address, seeking_talent',
+                              ", g || ' Main Street', random() < 0.3")
+  artist_ids = insert_entities('Artist', ARTIST_NOUNS, artists, ', seeking_venue',
+                               ', random() < 0.3')
+  insert_shows(venue_ids, artist_ids, shows, skew, days)
+  summaries.refresh()
+  changes.bump(db.session, [Venue.__tablename__, Artist.__tablename__, Show.__tablename__])
+  db.session.commit()
+  db.session.execute(text('ANALYZE "Venue"; ANALYZE "Artist"; ANALYZE "Show"'))
+  db.session.commit()
+  return venue_ids, artist_ids
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--venues', type=int, default=2000)
+  parser.add_argument('--artists', type=int, default=5000)
+  parser.add_argument('--shows', type=int, default=200000)
+  parser.add_argument('--skew', type=float, default=2.0,
+                      help='Concentration of shows on hot venues and artists (1 is uniform).')
+  parser.add_argument('--days', type=int, default=365,
+                      help='Shows fall within this many days before or after today.')
+  parser.add_argument('--random-seed', type=float, help='Seed in [-1, 1] for repeatable data.')
+  parser.add_argument('--truncate', action='store_true',
+                      help='Delete all venues, artists and shows first.')
+  args = parser.parse_args()
+
+  with create_app().app_context():
+    started = time.perf_counter()
+    seed(args.venues, args.artists, args.shows, args.skew, args.days, args.random_seed,
+         args.truncate)
+    print('Seeded %d venues, %d artists and %d shows in %.1fs'
+          % (args.venues, args.artists, args.shows, time.perf_counter() - started))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,125 @@
+"""Benchmark the Show lookups behind the venue and artist detail pages.
+
+Seeds a large Show table inside a single transaction, then reports the query
+plans and latency of the detail-page queries without and with the composite
+(venue_id, start_time) and (artist_id, start_time) indexes. The GiST
+(venue_id, period) and (artist_id, period) indexes of the conflict check
+could also answer these lookups, so they are dropped for both runs; the
+Show indexes in place are listed before each run. Everything is rolled
+back at the end, so the target database is left as it was.
+
+Usage:
+    python benchmarks/show_indexes.py --shows 1000000 --venues 2000 --artists 5000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import db, Venue, Artist, Show
+
+INDEXES = {
+  'ix_Show_venue_id_start_time': '"Show" (venue_id, start_time)',
+  'ix_Show_artist_id_start_time': '"Show" (artist_id, start_time)',
+}
+# Also lead with venue_id or artist_id; kept out of the comparison.
+PERIOD_INDEXES = ['ix_Show_venue_id_period', 'ix_Show_artist_id_period']
+
+
+def seed(cursor, venues, artists, shows):
+  cursor.execute('INSERT INTO "Venue" (name, city, state, seeking_talent) '
+                 "SELECT 'Bench Venue ' || g, 'City ' || g %% 50, 'CA', false "
+                 'FROM generate_series(1, %s) g RETURNING id', (venues,))
+  venue_ids = [row[0] for row in cursor.fetchall()]
+  cursor.execute('INSERT INTO "Artist" (name, city, state, seeking_venue) '
+                 "SELECT 'Bench Artist ' || g, 'City ' || g %% 50, 'CA', false "
+                 'FROM generate_series(1, %s) g RETURNING id', (artists,))
+  artist_ids = [row[0] for row in cursor.fetchall()]
+  # Shows spread over two years around now, so half of them are upcoming.
+  cursor.execute('INSERT INTO "Show" (venue_id, artist_id, start_time) '
+                 'SELECT %s + floor(random() * %s)::int, %s + floor(random() * %s)::int, '
+                 "now() + (random() * 730 - 365) * interval '1 day' "
+                 'FROM generate_series(1, %s)',
+                 (min(venue_ids), venues, min(artist_ids), artists, shows))
+  return venue_ids[0], artist_ids[0]
+
+
+def detail_queries(venue_id, artist_id):
+  now = datetime.now()
+  venue_shows = Show.query.filter_by(venue_id=venue_id).join(
+    Artist, Show.artist_id == Artist.id).add_columns(
+      Artist.id, Artist.name, Artist.image_link, Show.start_time)
+  artist_shows = Show.query.filter_by(artist_id=artist_id).join(
+    Venue, Show.venue_id == Venue.id).add_columns(
+      Venue.id, Venue.name, Venue.image_link, Show.start_time)
+  return {
+    'venue upcoming': venue_shows.filter(Show.start_time > now),
+    'venue past': venue_shows.filter(Show.start_time <= now),
+    'artist upcoming': artist_shows.filter(Show.start_time > now),
+    'artist past': artist_shows.filter(Show.start_time <= now),
+  }
+
+
+def show_indexes(cursor):
+  cursor.execute("SELECT indexname FROM pg_indexes WHERE tablename = 'Show' ORDER BY indexname")
+  return ', '.join(row[0] for row in cursor.fetchall())
+
+
+def measure(cursor, queries, repeat):
+  for label, query in queries.items():
+    compiled = query.statement.compile(dialect=db.engine.dialect)
+    cursor.execute('EXPLAIN (ANALYZE, BUFFERS) ' + str(compiled), compiled.params)
+    plan = [row[0] for row in cursor.fetchall()]
+    timings = []
+    for _ in range(repeat):
+      started = time.perf_counter()
+      cursor.execute(str(compiled), compiled.params)
+      cursor.fetchall()
+      timings.append((time.perf_counter() - started) * 1000)
+    print('--- %s: median %.2f ms, min %.2f ms over %d runs'
+          % (label, statistics.median(timings), min(timings), repeat))
+    for line in plan:
+      print('    ' + line)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--venues', type=int, default=2000)
+  parser.add_argument('--artists', type=int, default=5000)
+  parser.add_argument('--shows', type=int, default=1000000)
+  parser.add_argument('--repeat', type=int, default=20)
+  args = parser.parse_args()
+
+  with create_app().app_context():
+    connection = db.engine.raw_connection()
+    try:
+      cursor = connection.cursor()
+      print('Seeding %d shows...' % args.shows)
+      venue_id, artist_id = seed(cursor, args.venues, args.artists, args.shows)
+      queries = detail_queries(venue_id, artist_id)
+
+      for name in list(INDEXES) + PERIOD_INDEXES:
+        cursor.execute('DROP INDEX IF EXISTS "%s"' % name)
+      cursor.execute('ANALYZE "Venue"; ANALYZE "Artist"; ANALYZE "Show"')
+      print('\n=== Without composite indexes')
+      print('Show indexes: %s' % show_indexes(cursor))
+      measure(cursor, queries, args.repeat)
+
+      for name, target in INDEXES.items():
+        cursor.execute('CREATE INDEX IF NOT EXISTS "%s" ON %s' % (name, target))
+      cursor.execute('ANALYZE "Show"')
+      print('\n=== With composite indexes')
+      print('Show indexes: %s' % show_indexes(cursor))
+      measure(cursor, queries, args.repeat)
+    finally:
+      connection.rollback()
+      connection.close()
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,97 @@
+"""Measure how long a fresh process takes to import and build the app.
+
+Each run starts a new interpreter that imports app.py, calls create_app(),
+optionally runs preload() the way a forking server's master process would,
+and then serves a first request through the test client. Reports the
+median and fastest time of each step over --runs processes, and which of
+the heavy optional modules the process had imported by the end.
+With --importtime, also lists the modules that take longest to import,
+from `python -X importtime`.
+
+Usage:
+    python benchmarks/startup_time.py --runs 20 --importtime
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that the app only needs for some requests or commands.
+HEAVY_MODULES = ['babel', 'dateutil', 'alembic', 'flask_migrate', 'flask_moment']
+
+PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+flask_app = app.create_app()
+created = time.perf_counter()
+if %(preload)r:
+  app.preload(flask_app)
+preloaded = time.perf_counter()
+flask_app.test_client().get(%(path)r).get_data()
+served = time.perf_counter()
+print(json.dumps({
+  'import': imported - started,
+  'create_app': created - imported,
+  'preload': preloaded - created,
+  'first_request': served - preloaded,
+  'total': served - started,
+  'modules': len(sys.modules),
+  'loaded': [name for name in %(heavy)r if name in sys.modules],
+}))
+'''
+
+STEPS = ['import', 'create_app', 'preload', 'first_request', 'total']
+
+
+def probe(path, preload):
+  output = subprocess.check_output(
+    [sys.executable, '-c', PROBE % {'path': path, 'preload': preload, 'heavy': HEAVY_MODULES}],
+    cwd=ROOT)
+  return json.loads(output.decode().splitlines()[-1])
+
+
+def slowest_imports(limit):
+  # `-X importtime` writes "import time: self | cumulative | name" lines,
+  # with the names of nested imports indented two spaces per level. The
+  # modules app.py imports directly are one level down.
+  result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=ROOT,
+                          stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, check=True)
+  rows = []
+  for line in result.stderr.decode().splitlines()[1:]:
+    _, cumulative_us, name = line.split('|')
+    if len(name) - len(name.lstrip()) <= 3:
+      rows.append((int(cumulative_us), name.strip()))
+  return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--runs', type=int, default=10)
+  parser.add_argument('--path', default='/', help='URL of the first request.')
+  parser.add_argument('--preload', action='store_true', help='Run preload() before the request.')
+  parser.add_argument('--importtime', type=int, nargs='?', const=15, default=0, metavar='N',
+                      help='Also list the N slowest top-level imports of app.py.')
+  args = parser.parse_args()
+
+  runs = [probe(args.path, args.preload) for _ in range(args.runs)]
+  print('%-14s %9s %9s' % ('step', 'median', 'fastest'))
+  for step in STEPS:
+    times = [run[step] * 1000 for run in runs]
+    print('%-14s %7.1fms %7.1fms' % (step, statistics.median(times), min(times)))
+  print('modules imported: %d' % runs[-1]['modules'])
+  print('heavy modules imported: %s' % (', '.join(runs[-1]['loaded']) or 'none'))
+
+  if args.importtime:
+    print('\nSlowest imports of app.py (cumulative):')
+    for cumulative_us, name in slowest_imports(args.importtime):
+      print('%9.1fms  %s' % (cumulative_us / 1000.0, name))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,70 @@
+"""Compare the throughput of gunicorn with one and with several workers.
+
+Starts `gunicorn wsgi:app` with the settings of gunicorn.conf.py (preloaded
+app, gthread workers) once for each worker count in --workers, fires the
+same mix of read-only requests at it from --concurrency simultaneous
+clients and reports requests per second and latency percentiles. As in
+benchmarks/async_throughput.py, the database is reached through a proxy
+that adds --db-latency milliseconds to every reply.
+
+Usage:
+    python benchmarks/wsgi_throughput.py --workers 1,4 --threads 4 --concurrency 32
+"""
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import config
+from async_throughput import LatencyProxy, measure, proxied_url, wait_for
+
+# gunicorn 20.0 has no `python -m gunicorn`.
+GUNICORN = 'from gunicorn.app.wsgiapp import run; run()'
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--workers', default='1,%d' % (multiprocessing.cpu_count() * 2 + 1),
+                      help='Comma-separated worker counts to compare.')
+  parser.add_argument('--threads', type=int, default=4, help='Threads per worker.')
+  parser.add_argument('--concurrency', type=int, default=32)
+  parser.add_argument('--requests', type=int, default=2000)
+  parser.add_argument('--db-latency', type=float, default=2.0,
+                      help='Milliseconds added to every database reply.')
+  parser.add_argument('--port', type=int, default=5103)
+  args = parser.parse_args()
+
+  proxy = LatencyProxy(None, args.db_latency / 1000.0)
+  proxy.start()
+  env = dict(os.environ)
+  env['DATABASE_URL'], proxy.upstream = proxied_url(config.SQLALCHEMY_DATABASE_URI, proxy.port)
+  env['GUNICORN_BIND'] = '127.0.0.1:%d' % args.port
+
+  results = []
+  for workers in [int(count) for count in args.workers.split(',')]:
+    command = [sys.executable, '-c', GUNICORN, '--config', 'gunicorn.conf.py',
+               '--workers', str(workers), '--threads', str(args.threads),
+               '--access-logfile', '/dev/null', 'wsgi:app']
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+    try:
+      wait_for(args.port)
+      results.append(measure('workers=%d, threads=%d' % (workers, args.threads),
+                             args.port, args))
+    finally:
+      process.terminate()
+      process.wait()
+
+  print('%-24s %10s %8s %8s %8s' % ('mode', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms'))
+  for result in results:
+    print('%-24s %10.1f %8.1f %8.1f %8.1f' % (result['mode'], result['requests_per_second'],
+                                              result['p50_ms'], result['p95_ms'],
+                                              result['p99_ms']))
+
+
+if __name__ == '__main__':
+  main()
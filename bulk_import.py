@@ -0,0 +1,177 @@
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+from werkzeug.datastructures import MultiDict
+
+# Fields that hold several values; CSV files separate them with semicolons.
+MULTI_VALUE_FIELDS = ('genres',)
+
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    return 'csv' if extension == '.csv' else 'ndjson'
+
+
+def read_rows(path, fmt):
+    # Yield (line number, row dict) pairs without loading the whole file.
+    # Rows that cannot be decoded are yielded with a None row.
+    with open(path, newline='', encoding='utf-8') as source:
+        if fmt == 'csv':
+            for number, row in enumerate(csv.DictReader(source), start=2):
+                yield number, row
+        else:
+            for number, line in enumerate(source, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                yield number, row if isinstance(row, dict) else None
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def to_formdata(row):
+    formdata = MultiDict()
+    for key, value in row.items():
+        if value is None:
+            continue
+        if isinstance(value, str) and key in MULTI_VALUE_FIELDS:
+            value = [item.strip() for item in value.split(';') if item.strip()]
+        if isinstance(value, bool):
+            value = 'y' if value else ''
+        for item in value if isinstance(value, list) else [value]:
+            formdata.add(key, str(item))
+    return formdata
+
+
+def validate(form_class, row):
+    # Run a row through the same WTForms rules as the HTML forms.
+    form = form_class(formdata=to_formdata(row), meta={'csrf': False})
+    form.validate()
+    return form.data, form.errors
+
+
+def resolve_foreign_key(db, model, prefix, rows):
+    """Fill in ``<prefix>_id`` for a batch of rows with two queries at most.
+
+    Rows reference the venue or artist either by id or by its exact name.
+    Names are looked up together and ids are checked for existence
+    together. Returns the error message for each row index that cannot be
+    resolved.
+    """
+    key, name_key = prefix + '_id', prefix + '_name'
+    errors = {}
+    ids, names = set(), set()
+    for index, (row, data) in enumerate(rows):
+        if data.get(key):
+            try:
+                data[key] = int(data[key])
+                ids.add(data[key])
+            except ValueError:
+                errors[index] = {key: ['Not a valid id.']}
+        elif row.get(name_key):
+            names.add(row[name_key])
+        else:
+            errors[index] = {key: ['Missing %s or %s.' % (key, name_key)]}
+    existing = set()
+    if ids:
+        existing = {id for id, in db.session.query(model.id).filter(model.id.in_(ids))}
+    by_name = {}
+    if names:
+        for id, name in db.session.query(model.id, model.name).filter(model.name.in_(names)):
+            by_name.setdefault(name, []).append(id)
+    for index, (row, data) in enumerate(rows):
+        if index in errors:
+            continue
+        if isinstance(data.get(key), int):
+            if data[key] not in existing:
+                errors[index] = {key: ['No %s with this id.' % prefix]}
+            continue
+        matches = by_name.get(row[name_key], [])
+        if len(matches) == 1:
+            data[key] = matches[0]
+        else:
+            errors[index] = {name_key: ['%s %s with this name.' % (
+                'No' if not matches else 'More than one', prefix)]}
+    return errors
+
+
+class ImportReport(object):
+    """Counts imported and rejected rows and writes rejected ones out."""
+
+    def __init__(self, rejects=None):
+        self.rejects = rejects
+        self.read = 0
+        self.inserted = 0
+        self.rejected = 0
+        self.started = time.perf_counter()
+
+    def reject(self, line, row, errors):
+        self.rejected += 1
+        if self.rejects is not None:
+            self.rejects.write(json.dumps({'line': line, 'errors': errors, 'row': row},
+                                          default=str) + '\n')
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        return ('%d rows read, %d inserted, %d rejected in %.1fs (%.0f rows/s)'
+                % (self.read, self.inserted, self.rejected, self.elapsed, self.rows_per_second))
+
+
+def run_import(db, table, form_class, columns, rows, batch_size, report,
+               resolve=None, after_batch=None, progress=None):
+    """Validate and insert ``rows`` into ``table`` in batches.
+
+    Each batch is written with a single multi-row INSERT and committed on its
+    own. ``resolve(batch)`` may fill in foreign keys for the whole batch and
+    returns errors by batch index; ``after_batch(values)`` runs inside the
+    batch's transaction after the insert.
+    """
+    for batch in batches(rows, batch_size):
+        report.read += len(batch)
+        valid = []
+        for line, row in batch:
+            if row is None:
+                report.reject(line, None, {'row': ['Could not be decoded.']})
+                continue
+            data, errors = validate(form_class, row)
+            if errors:
+                report.reject(line, row, errors)
+            else:
+                valid.append((line, row, data))
+        if resolve is not None and valid:
+            errors = resolve([(row, data) for line, row, data in valid])
+            for index in sorted(errors):
+                line, row, data = valid[index]
+                report.reject(line, row, errors[index])
+            valid = [item for index, item in enumerate(valid) if index not in errors]
+        if valid:
+            values = [{column: data.get(column) for column in columns}
+                      for line, row, data in valid]
+            db.session.execute(table.insert().values(values))
+            if after_batch is not None:
+                after_batch(values)
+            db.session.commit()
+            report.inserted += len(values)
+        if progress is not None:
+            progress(report)
+    return report
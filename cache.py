@@ -0,0 +1,62 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+
+class PageCache(object):
+    """In-process LRU cache of rendered pages.
+
+    Keys are ``(kind, entity_id, variant)`` tuples such as
+    ``('venue', 3, 'html')``. An entry lives for at most ``ttl`` seconds, or
+    until the ``expires_at`` datetime given when it was stored if that comes
+    first, and is dropped early by ``invalidate()`` from the write handlers.
+    Each worker process keeps its own cache and only sees its own writes, so
+    an entry can also be stored with the ``version`` of the data it was built
+    from; looking it up with any other version is a miss.
+    """
+
+    def __init__(self, ttl=300, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.ttl = app.config.get('PAGE_CACHE_TTL', self.ttl)
+        self.max_entries = app.config.get('PAGE_CACHE_MAX_ENTRIES', self.max_entries)
+
+    def get(self, key, version=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > datetime.now() and entry[2] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value, expires_at=None, version=None):
+        deadline = datetime.now() + timedelta(seconds=self.ttl)
+        if expires_at is not None:
+            deadline = min(deadline, expires_at)
+        with self._lock:
+            self._entries[key] = (deadline, value, version)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, kind, entity_id=None):
+        # Drop every entry of one entity, or of every entity of a kind.
+        with self._lock:
+            stale = [key for key in self._entries
+                     if key[0] == kind and (entity_id is None or key[1] == entity_id)]
+            for key in stale:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
@@ -0,0 +1,69 @@
+from datetime import datetime
+from itertools import chain
+
+from sqlalchemy import event, func, literal_column, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert
+
+
+class ChangeTracker(object):
+    """Maintains the TableVersion high-water marks.
+
+    Every ORM flush that inserts, changes or deletes rows of a tracked model
+    bumps the version of its table inside the same transaction. Writes that
+    bypass the ORM (such as `flask import-data`) call ``bump()`` themselves.
+    ``validator()`` turns the marks of the tables a page is built from into
+    a version string and a last-modified time for HTTP caching.
+    """
+
+    def __init__(self, db, TableVersion, models):
+        self.db = db
+        self.table = TableVersion.__table__
+        self.tracked = {model: model.__tablename__ for model in models}
+        event.listen(db.session, 'after_flush', self.after_flush)
+
+    def after_flush(self, session, flush_context):
+        # new/dirty/deleted still describe the flushed changes at this point.
+        changed = chain(session.new, session.deleted,
+                        (obj for obj in session.dirty if session.is_modified(obj)))
+        names = {self.tracked[type(obj)] for obj in changed if type(obj) in self.tracked}
+        if names:
+            self.bump(session, names)
+
+    def bump(self, session, names, now=None):
+        now = now or datetime.utcnow()
+        stmt = insert(self.table).values(
+            [{'table_name': name, 'version': 1, 'changed_at': now} for name in sorted(names)])
+        stmt = stmt.on_conflict_do_update(index_elements=['table_name'], set_={
+            'version': self.table.c.version + 1,
+            'changed_at': stmt.excluded.changed_at,
+        })
+        session.execute(stmt)
+
+    def validator(self, names, since=None):
+        """Return a version string and last-modified time for ``names``.
+
+        ``since`` is an extra scalar select of a local time at which the
+        content last changed without any write, such as the start of the
+        latest show that is now in the past.
+        """
+        row = self.db.session.execute(self.validator_query(names, since)).first()
+        return self.validator_result(row, since is not None)
+
+    def validator_query(self, names, since=None):
+        table = self.table
+        version = table.c.table_name + ':' + table.c.version.cast(self.db.String)
+        columns = [func.string_agg(version, aggregate_order_by(literal_column("','"),
+                                                               table.c.table_name)),
+                   func.max(table.c.changed_at)]
+        if since is not None:
+            columns.append(since)
+        return select(columns).where(table.c.table_name.in_(sorted(names)))
+
+    def validator_result(self, row, with_since=False):
+        version, last_modified = row[0] or '', row[1]
+        if with_since and row[2] is not None:
+            version += '@' + row[2].isoformat()
+            # Show times are local; changed_at and Last-Modified are UTC.
+            since_utc = datetime.utcfromtimestamp(row[2].timestamp())
+            last_modified = max(filter(None, [last_modified, since_utc]))
+        return version, last_modified
@@ -1,13 +1,86 @@
 import os
-SECRET_KEY = os.urandom(32)
+
+from sqlalchemy.pool import NullPool
+
+from dbpool import InstrumentedQueuePool
+
+def env_flag(name, default):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+# Set SECRET_KEY in production so that sessions survive restarts; the
+# random default is only shared by processes forked from one master.
+SECRET_KEY = os.environ.get('SECRET_KEY') or os.urandom(32)
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Enable debug mode.
-DEBUG = True
+# Enable debug mode; gunicorn.conf.py turns it off.
+DEBUG = env_flag('DEBUG', True)
 
 # Connect to the database
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgres://postgres@localhost:5432/fyyur')
+SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Connection pool settings, overridable from the environment.
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = env_flag('DB_POOL_PRE_PING', True)
+# Behind PgBouncer, connections go straight back to the bouncer after each
+# use instead of being held in a second pool here, and the async serving
+# mode's asyncpg pool caches no prepared statements (async_app.py).
+DB_PGBOUNCER = env_flag('DB_PGBOUNCER', False)
+
+if DB_PGBOUNCER:
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'poolclass': NullPool,
+        'pool_pre_ping': DB_POOL_PRE_PING,
+    }
+else:
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': DB_POOL_PRE_PING,
+    }
+
+# Read replicas, as a comma-separated list of URIs. GET requests read from a
+# healthy replica; writes and the reads of a client that has just written go
+# to the primary.
+REPLICA_URLS = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',')
+                if url.strip()]
+SQLALCHEMY_BINDS = {'replica_%d' % number: url for number, url in enumerate(REPLICA_URLS)}
+REPLICA_BINDS = sorted(SQLALCHEMY_BINDS)
+# Seconds a client keeps reading from the primary after its own writes.
+REPLICA_STICKY_SECONDS = float(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+# Replicas further behind than this are skipped; lag is checked this often.
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 10))
+REPLICA_CHECK_INTERVAL = float(os.environ.get('REPLICA_CHECK_INTERVAL', 5))
+
+# Number of results shown per page of venue/artist search.
+SEARCH_RESULTS_PER_PAGE = 20
+
+# Number of rows shown per page of the venue, artist and show listings.
+LISTING_PAGE_SIZE = 50
+
+# Rendered venue/artist pages are cached for at most this many seconds.
+PAGE_CACHE_TTL = 300
+PAGE_CACHE_MAX_ENTRIES = 1024
+
+# Rows fetched from the server-side cursor per chunk of a streamed export.
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+
+# Past shows listed on a venue or artist page, and per "load more" page.
+DETAIL_PAST_SHOWS = 10
+
+# Longest window, in days, of the show calendar.
+CALENDAR_MAX_DAYS = 31
 
+# Most proposed slots one request to /api/v1/shows/conflicts may check.
+SCHEDULE_CHECK_MAX_SLOTS = int(os.environ.get('SCHEDULE_CHECK_MAX_SLOTS', 100))
 
-# TODO IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = 'postgres://postgres@localhost:5432/fyyur'
+# asyncpg pool of the async serving mode (async_app.py).
+ASYNC_DB_POOL_MIN_SIZE = int(os.environ.get('ASYNC_DB_POOL_MIN_SIZE', 2))
+ASYNC_DB_POOL_MAX_SIZE = int(os.environ.get('ASYNC_DB_POOL_MAX_SIZE', 20))
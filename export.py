@@ -0,0 +1,61 @@
+import csv
+import io
+import json
+from datetime import date
+
+# Output formats and their content types.
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def to_json_value(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def to_csv_value(value):
+    # Multiple values are joined with semicolons, as `flask import-data` expects.
+    if isinstance(value, (list, tuple)):
+        return ';'.join(str(item) for item in value)
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def csv_chunks(columns, rows, chunk_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for number, row in enumerate(rows, start=1):
+        writer.writerow([to_csv_value(value) for value in row])
+        if number % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def ndjson_chunks(columns, rows, chunk_size):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps({column: to_json_value(value)
+                                 for column, value in zip(columns, row)}) + '\n')
+        if len(lines) == chunk_size:
+            yield ''.join(lines)
+            lines = []
+    yield ''.join(lines)
+
+
+def stream_export(query, columns, fmt, batch_size):
+    """Yield the rows of a column query as CSV or NDJSON text chunks.
+
+    The query is run on a server-side cursor and fetched ``batch_size`` rows
+    at a time, so memory use does not depend on the number of rows exported.
+    Each chunk holds one batch.
+    """
+    rows = query.yield_per(batch_size)
+    chunks = csv_chunks if fmt == 'csv' else ndjson_chunks
+    return chunks(columns, rows, batch_size)
@@ -0,0 +1,45 @@
+import multiprocessing
+import os
+
+# Production settings for `gunicorn wsgi:app`. Every count can be
+# overridden from the environment; Heroku sets WEB_CONCURRENCY and PORT.
+os.environ.setdefault('DEBUG', '0')
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:%s' % os.environ.get('PORT', '8000'))
+
+# (2 x CPUs) + 1 worker processes, as the gunicorn docs suggest, each
+# with a few threads so that requests waiting on the database overlap.
+# Every thread may hold a connection, so keep workers x threads within
+# what the database accepts and threads within DB_POOL_SIZE.
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+
+# Import the app once in the master; the forked workers share its memory
+# and the SECRET_KEY it generated.
+preload_app = True
+
+# Replace each worker after a jittered number of requests, so leaks stay
+# bounded and the workers do not all restart at once. Restarting workers
+# finish their requests in flight for up to graceful_timeout seconds.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+graceful_timeout = 30
+timeout = 30
+keepalive = 5
+
+accesslog = '-'
+
+
+def pre_fork(server, worker):
+    # The master never serves requests, but drop anything preloading opened.
+    from app import dispose_engines
+    from wsgi import app
+    dispose_engines(app)
+
+
+def post_fork(server, worker):
+    # Each worker opens its own connections on first use.
+    from app import dispose_engines
+    from wsgi import app
+    dispose_engines(app)
@@ -0,0 +1,40 @@
+"""add search indexes
+
+Revision ID: 8d3e1f6a2c90
+Revises: 5f2a8c31d4b7
+Create Date: 2026-10-18 10:03:17.552913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d3e1f6a2c90'
+down_revision = '5f2a8c31d4b7'
+branch_labels = None
+depends_on = None
+
+TRIGRAM_INDEXES = [
+    ('Venue', 'name'),
+    ('Venue', 'city'),
+    ('Venue', 'state'),
+    ('Artist', 'name'),
+    ('Artist', 'city'),
+    ('Artist', 'state'),
+    ('Artist', 'genres'),
+]
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, column in TRIGRAM_INDEXES:
+        op.create_index('ix_%s_%s_trgm' % (table, column), table, [column], unique=False,
+                        postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+    op.create_index('ix_Venue_genres', 'Venue', ['genres'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_Venue_genres', table_name='Venue')
+    for table, column in reversed(TRIGRAM_INDEXES):
+        op.drop_index('ix_%s_%s_trgm' % (table, column), table_name=table)
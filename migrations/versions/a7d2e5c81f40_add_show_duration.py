@@ -0,0 +1,38 @@
+"""add show duration
+
+Revision ID: a7d2e5c81f40
+Revises: f2c8a6d90b13
+Create Date: 2026-10-18 18:02:41.337590
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'a7d2e5c81f40'
+down_revision = 'f2c8a6d90b13'
+branch_labels = None
+depends_on = None
+
+PERIOD = "tsrange(start_time, start_time + duration_minutes * interval '1 minute')"
+
+
+def upgrade():
+    # btree_gist lets the integer venue_id/artist_id share a GiST index with
+    # the show's time range.
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.add_column('Show', sa.Column('duration_minutes', sa.Integer(), server_default='120',
+                                    nullable=False))
+    op.create_check_constraint('ck_Show_duration_minutes_range', 'Show',
+                               'duration_minutes BETWEEN 1 AND 1440')
+    op.create_index('ix_Show_venue_id_period', 'Show', ['venue_id', sa.text(PERIOD)], unique=False,
+                    postgresql_using='gist', postgresql_where=sa.text('start_time IS NOT NULL'))
+    op.create_index('ix_Show_artist_id_period', 'Show', ['artist_id', sa.text(PERIOD)], unique=False,
+                    postgresql_using='gist', postgresql_where=sa.text('start_time IS NOT NULL'))
+
+
+def downgrade():
+    op.drop_index('ix_Show_artist_id_period', table_name='Show')
+    op.drop_index('ix_Show_venue_id_period', table_name='Show')
+    op.drop_constraint('ck_Show_duration_minutes_range', 'Show', type_='check')
+    op.drop_column('Show', 'duration_minutes')
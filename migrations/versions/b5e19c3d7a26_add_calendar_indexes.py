@@ -0,0 +1,28 @@
+"""add calendar indexes
+
+Revision ID: b5e19c3d7a26
+Revises: a7d2e5c81f40
+Create Date: 2026-10-18 19:26:13.582104
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'b5e19c3d7a26'
+down_revision = 'a7d2e5c81f40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_Show_start_time_brin', 'Show', ['start_time'], unique=False,
+                    postgresql_using='brin',
+                    postgresql_with={'pages_per_range': 32, 'autosummarize': 'on'})
+    op.create_index('ix_Venue_lower_city_state', 'Venue', [sa.text('lower(city)'), 'state'],
+                    unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Venue_lower_city_state', table_name='Venue')
+    op.drop_index('ix_Show_start_time_brin', table_name='Show')
@@ -0,0 +1,39 @@
+"""convert artist genres to array
+
+Revision ID: f2c8a6d90b13
+Revises: e3b7d14a9f62
+Create Date: 2026-10-18 16:27:05.904716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'f2c8a6d90b13'
+down_revision = 'e3b7d14a9f62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.drop_index('ix_Artist_genres_trgm', table_name='Artist')
+    # Existing values are Postgres array literals such as '{Jazz,"Rock n Roll"}';
+    # anything else is read as a comma-separated list.
+    op.alter_column('Artist', 'genres',
+                    existing_type=sa.String(length=120),
+                    type_=postgresql.ARRAY(sa.String(length=120)),
+                    postgresql_using="CASE WHEN left(genres, 1) = '{' THEN genres::varchar(120)[] "
+                                     "WHEN genres <> '' THEN string_to_array(genres, ',')::varchar(120)[] "
+                                     "END")
+    op.create_index('ix_Artist_genres', 'Artist', ['genres'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_Artist_genres', table_name='Artist')
+    op.alter_column('Artist', 'genres',
+                    existing_type=postgresql.ARRAY(sa.String(length=120)),
+                    type_=sa.String(length=120),
+                    postgresql_using='genres::varchar(120)')
+    op.create_index('ix_Artist_genres_trgm', 'Artist', ['genres'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'genres': 'gin_trgm_ops'})
@@ -1,71 +1,172 @@
 from datetime import datetime
 
-from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
-from flask_moment import Moment
-
-# Initialize flask app.
-def setup_app():
-    app = Flask(__name__)
-    moment = Moment(app)
-    return app
-
-# Connect app and database.
-def setup_db(app):
-    app.config.from_object('config')
-    db = SQLAlchemy(app)
-    return db
-
-# Create model for venue.
-def setup_venue_model(db):
-    class Venue(db.Model):
-        __tablename__ = 'Venue'
-
-        id = db.Column(db.Integer, primary_key=True, nullable=False)
-        name = db.Column(db.String, nullable=False)
-        genres = db.Column(db.ARRAY(db.String(120)))
-        address = db.Column(db.String(120))
-        city = db.Column(db.String(120))
-        state = db.Column(db.String(120))
-        phone = db.Column(db.String(120))
-        website = db.Column(db.String(500))
-        image_link = db.Column(db.String(500))
-        facebook_link = db.Column(db.String(120))
-        seeking_talent = db.Column(db.Boolean, nullable=False, default=False)
-        seeking_description = db.Column(db.String(280))
-        shows = db.relationship("Show", backref="venue")
-    return Venue
-
-# Create model for artist.
-def setup_artist_model(db):
-    class Artist(db.Model):
-        __tablename__ = 'Artist'
-    
-        id = db.Column(db.Integer, primary_key=True, nullable=False)
-        name = db.Column(db.String, nullable=False)
-        genres = db.Column(db.String(120))
-        city = db.Column(db.String(120))
-        state = db.Column(db.String(120))
-        phone = db.Column(db.String(120))
-        website = db.Column(db.String(500))
-        image_link = db.Column(db.String(500))
-        facebook_link = db.Column(db.String(120))
-        seeking_venue = db.Column(db.Boolean, nullable=False, default=False)
-        seeking_description = db.Column(db.String(280))
-        shows = db.relationship("Show", backref="artist")
-    return Artist
-
-# Create model for show.
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from replicas import RoutingSQLAlchemy
+
+# Server-side default of the created_at/updated_at columns, in UTC like the
+# Python-side datetime.utcnow defaults.
+UTC_NOW = text("timezone('utc', now())")
+
+# Shows without an explicit duration are booked for two hours.
+DEFAULT_SHOW_DURATION_MINUTES = 120
+MAX_SHOW_DURATION_MINUTES = 24 * 60
+
+# The time a show occupies its venue and artist. The GiST indexes on it
+# (btree_gist supplies the integer column's operator class) find the shows
+# overlapping a slot in logarithmic time; the conflict check in
+# scheduling.py spells it the same way so Postgres matches it to them.
+SHOW_PERIOD = text("tsrange(start_time, start_time + duration_minutes * interval '1 minute')")
+
+# The models are declared on an unbound extension; create_app() in app.py
+# binds it to each app with db.init_app(). Reads of GET requests may be
+# routed to a replica, see replicas.py.
+db = RoutingSQLAlchemy()
+
+
+# Model for venue.
+class Venue(db.Model):
+    __tablename__ = 'Venue'
+    # Trigram indexes back the fuzzy search on names and locations.
+    __table_args__ = (
+        db.Index('ix_Venue_name_trgm', 'name', postgresql_using='gin',
+                 postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_Venue_city_trgm', 'city', postgresql_using='gin',
+                 postgresql_ops={'city': 'gin_trgm_ops'}),
+        db.Index('ix_Venue_state_trgm', 'state', postgresql_using='gin',
+                 postgresql_ops={'state': 'gin_trgm_ops'}),
+        db.Index('ix_Venue_genres', 'genres', postgresql_using='gin'),
+        # Keyset pagination order of the venue listing.
+        db.Index('ix_Venue_name_id', 'name', 'id'),
+        # Calendar lookups by city, matched case-insensitively.
+        db.Index('ix_Venue_lower_city_state', text('lower(city)'), 'state'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, nullable=False)
+    name = db.Column(db.String, nullable=False)
+    genres = db.Column(ARRAY(db.String(120)))
+    address = db.Column(db.String(120))
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    website = db.Column(db.String(500))
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    seeking_talent = db.Column(db.Boolean, nullable=False, default=False)
+    seeking_description = db.Column(db.String(280))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           server_default=UTC_NOW)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           onupdate=datetime.utcnow, server_default=UTC_NOW)
+    shows = db.relationship("Show", backref="venue")
+
+
+# Model for artist.
+class Artist(db.Model):
+    __tablename__ = 'Artist'
+    # Trigram indexes back the fuzzy search on names and locations.
+    __table_args__ = (
+        db.Index('ix_Artist_name_trgm', 'name', postgresql_using='gin',
+                 postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_Artist_city_trgm', 'city', postgresql_using='gin',
+                 postgresql_ops={'city': 'gin_trgm_ops'}),
+        db.Index('ix_Artist_state_trgm', 'state', postgresql_using='gin',
+                 postgresql_ops={'state': 'gin_trgm_ops'}),
+        db.Index('ix_Artist_genres', 'genres', postgresql_using='gin'),
+        # Keyset pagination order of the artist listing.
+        db.Index('ix_Artist_name_id', 'name', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, nullable=False)
+    name = db.Column(db.String, nullable=False)
+    genres = db.Column(ARRAY(db.String(120)))
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    website = db.Column(db.String(500))
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    seeking_venue = db.Column(db.Boolean, nullable=False, default=False)
+    seeking_description = db.Column(db.String(280))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           server_default=UTC_NOW)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           onupdate=datetime.utcnow, server_default=UTC_NOW)
+    shows = db.relationship("Show", backref="artist")
+
+
+# Model for show.
 # The same pair of venue and artist could have multiple shows: many-to-many relationship.
 # Association object instead of table is used for storing shows' starting times
-def setup_show_model(db):
-    class Show(db.Model):
-        __tablename__ = 'Show'
-        
-        show_id = db.Column(db.Integer, primary_key=True)
-        venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
-        artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable=False)
-        start_time = db.Column(db.DateTime, default=datetime.utcnow)
-        venues = db.relationship("Venue", backref="show")
-        artists = db.relationship("Artist", backref="show")
-    return Show
+class Show(db.Model):
+    __tablename__ = 'Show'
+    # Detail pages and listings filter a venue's or an artist's shows by time.
+    __table_args__ = (
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+        # Keyset pagination order of the show listing.
+        db.Index('ix_Show_start_time_show_id', 'start_time', 'show_id'),
+        # Shows are mostly appended in start_time order, so a BRIN index of
+        # the time range of each few pages finds the pages of a date window
+        # at a fraction of the size of a btree. Pages filled by inserts are
+        # only summarized by (auto)vacuum; until then they match any window.
+        db.Index('ix_Show_start_time_brin', 'start_time', postgresql_using='brin',
+                 postgresql_with={'pages_per_range': 32, 'autosummarize': 'on'}),
+        # Scheduling conflicts per venue and per artist.
+        db.Index('ix_Show_venue_id_period', 'venue_id', SHOW_PERIOD, postgresql_using='gist',
+                 postgresql_where=text('start_time IS NOT NULL')),
+        db.Index('ix_Show_artist_id_period', 'artist_id', SHOW_PERIOD, postgresql_using='gist',
+                 postgresql_where=text('start_time IS NOT NULL')),
+        # ShowScheduler relies on the upper bound to narrow its searches.
+        db.CheckConstraint('duration_minutes BETWEEN 1 AND %d' % MAX_SHOW_DURATION_MINUTES,
+                           name='ck_Show_duration_minutes_range'),
+    )
+
+    show_id = db.Column(db.Integer, primary_key=True)
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
+    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable=False)
+    start_time = db.Column(db.DateTime, default=datetime.utcnow)
+    duration_minutes = db.Column(db.Integer, nullable=False, default=DEFAULT_SHOW_DURATION_MINUTES,
+                                 server_default=str(DEFAULT_SHOW_DURATION_MINUTES))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           server_default=UTC_NOW)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           onupdate=datetime.utcnow, server_default=UTC_NOW)
+    venues = db.relationship("Venue", backref="show")
+    artists = db.relationship("Artist", backref="show")
+
+
+# Summary models holding the show counts of each venue and artist.
+# Rows are kept up to date incrementally by ShowSummaries in summaries.py,
+# so listings do not have to count raw Show rows on every request.
+class VenueSummary(db.Model):
+    __tablename__ = 'VenueSummary'
+
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'),
+                         primary_key=True)
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    next_show_time = db.Column(db.DateTime, index=True)
+
+
+class ArtistSummary(db.Model):
+    __tablename__ = 'ArtistSummary'
+
+    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'),
+                          primary_key=True)
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    next_show_time = db.Column(db.DateTime, index=True)
+
+
+# Model holding a high-water mark of the writes to each table.
+# ChangeTracker in changes.py bumps a table's row in the same transaction as
+# every write to it, so one primary-key lookup tells whether anything a page
+# is built from has changed.
+class TableVersion(db.Model):
+    __tablename__ = 'TableVersion'
+
+    table_name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -0,0 +1,80 @@
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime
+
+from flask import abort
+from sqlalchemy import DateTime, tuple_
+
+# One page of a keyset-paginated listing. The cursors are opaque tokens for
+# the `after`/`before` query arguments, or None when there is no such page.
+Page = namedtuple('Page', ['items', 'prev_cursor', 'next_cursor'])
+
+
+def encode_cursor(keys, row):
+    values = []
+    for key in keys:
+        value = getattr(row, key.key)
+        values.append(value.isoformat() if isinstance(value, datetime) else value)
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(keys, token):
+    # Cursors come from the client, so anything but a list of one value of
+    # the right type per key is a bad request rather than a database error.
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token.encode()))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError(token)
+        return [decode_value(key, value) for key, value in zip(keys, values)]
+    except (ValueError, TypeError):
+        abort(400)
+
+
+def decode_value(key, value):
+    if isinstance(key.type, DateTime):
+        if not isinstance(value, str):
+            raise TypeError(value)
+        value = datetime.fromisoformat(value)
+        if value.tzinfo is not None:
+            raise ValueError(value)
+        return value
+    # bool is an int to Python, but never a valid id.
+    if not isinstance(value, key.type.python_type) or isinstance(value, bool):
+        raise TypeError(value)
+    return value
+
+
+# Fetch one page of `query` ordered by the `keys` columns, which must be
+# unique together (e.g. name and id) and backed by an index. Pages are
+# located by comparing against the boundary row's keys rather than with an
+# OFFSET, so fetching page N costs the same as fetching page 1.
+def keyset_page(query, keys, per_page, after=None, before=None):
+    rows = keyset_query(query, keys, per_page, after, before).all()
+    return keyset_result(rows, keys, per_page, after, before)
+
+
+# The two halves of keyset_page(), for callers that run the query themselves.
+def keyset_query(query, keys, per_page, after=None, before=None):
+    if before:
+        query = query.filter(tuple_(*keys) < tuple_(*decode_cursor(keys, before)))
+        query = query.order_by(*[key.desc() for key in keys])
+    else:
+        if after:
+            query = query.filter(tuple_(*keys) > tuple_(*decode_cursor(keys, after)))
+        query = query.order_by(*keys)
+    return query.limit(per_page + 1)
+
+
+def keyset_result(rows, keys, per_page, after=None, before=None):
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if before:
+        rows.reverse()
+    if not rows:
+        return Page([], None, None)
+    has_prev = has_more if before else bool(after)
+    has_next = bool(before) or has_more
+    return Page(rows,
+                encode_cursor(keys, rows[0]) if has_prev else None,
+                encode_cursor(keys, rows[-1]) if has_next else None)
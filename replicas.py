@@ -0,0 +1,131 @@
+import random
+import threading
+import time
+
+from flask import g, has_app_context, has_request_context, request, session
+from flask_sqlalchemy import SignallingSession, SQLAlchemy, get_state
+from sqlalchemy import event, exc, orm, text
+
+from dbpool import pool_stats
+
+# Seconds a replica is behind the primary: zero on a server that is not a
+# standby and on a standby that has replayed everything it received.
+LAG_QUERY = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() "
+    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp()) END")
+
+# Session cookie key holding the time until which a client reads from the
+# primary after its own writes.
+PRIMARY_UNTIL = 'db_primary_until'
+
+
+class RoutingSession(SignallingSession):
+    """Session that runs its queries on the bind chosen for the request.
+
+    ``ReplicaRouter`` stores the replica's bind key in ``g.db_bind``, or None
+    for the primary. Flushes and models with a ``__bind_key__`` of their own
+    always use their usual engine.
+    """
+
+    def get_bind(self, mapper=None, clause=None):
+        bind = g.get('db_bind') if has_app_context() else None
+        if bind is not None and not self._flushing:
+            table = getattr(mapper, 'persist_selectable', None)
+            if getattr(table, 'info', {}).get('bind_key') is None:
+                return get_state(self.app).db.get_engine(self.app, bind=bind)
+        return super(RoutingSession, self).get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+class ReplicaRouter(object):
+    """Sends the reads of GET requests to a healthy replica.
+
+    Replicas are the ``SQLALCHEMY_BINDS`` entries named in the app's
+    ``REPLICA_BINDS`` setting. A request stays on the primary when it may
+    write (any method but GET, HEAD and OPTIONS), when the same client
+    committed a write less than ``REPLICA_STICKY_SECONDS`` ago, or when every
+    replica is unreachable or more than ``REPLICA_MAX_LAG_SECONDS`` behind.
+    Each replica's lag is checked at most every ``REPLICA_CHECK_INTERVAL``
+    seconds.
+    """
+
+    READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, db, app=None):
+        self.db = db
+        self.binds = []
+        self.sticky_seconds = 5
+        self.max_lag = 10
+        self.check_interval = 5
+        self.last_write = 0.0
+        self._health = {}
+        self._lock = threading.Lock()
+        event.listen(db.session, 'after_commit', self.after_commit)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.binds = list(app.config.get('REPLICA_BINDS', []))
+        self.sticky_seconds = app.config.get('REPLICA_STICKY_SECONDS', self.sticky_seconds)
+        self.max_lag = app.config.get('REPLICA_MAX_LAG_SECONDS', self.max_lag)
+        self.check_interval = app.config.get('REPLICA_CHECK_INTERVAL', self.check_interval)
+        app.before_request(self.choose_bind)
+
+    def choose_bind(self):
+        g.db_bind = None
+        if not self.binds or request.method not in self.READ_METHODS:
+            return
+        if session.get(PRIMARY_UNTIL, 0) > time.time():
+            return
+        healthy = [bind for bind in self.binds if self.is_healthy(bind)]
+        if healthy:
+            g.db_bind = random.choice(healthy)
+
+    def after_commit(self, db_session):
+        # Read-your-writes: keep this client on the primary for a while.
+        self.last_write = time.time()
+        if has_request_context():
+            session[PRIMARY_UNTIL] = self.last_write + self.sticky_seconds
+
+    def is_healthy(self, bind):
+        now = time.monotonic()
+        with self._lock:
+            checked_at, healthy, lag = self._health.get(bind, (None, False, None))
+            if checked_at is not None and now - checked_at < self.check_interval:
+                return healthy
+            # Other requests keep the last verdict while this one checks.
+            self._health[bind] = (now, healthy, lag)
+        lag = self.replica_lag(bind)
+        healthy = lag is not None and lag <= self.max_lag
+        with self._lock:
+            self._health[bind] = (now, healthy, lag)
+        return healthy
+
+    def replica_lag(self, bind):
+        # None when the replica cannot be reached or its lag is unknown.
+        try:
+            with self.db.get_engine(bind=bind).connect() as connection:
+                lag = connection.execute(LAG_QUERY).scalar()
+        except exc.DBAPIError:
+            return None
+        return float(lag) if lag is not None else None
+
+    def cacheable(self):
+        # A replica may not have the latest write of this process yet, so
+        # pages it serves shortly after one must not go into the page cache.
+        return g.get('db_bind') is None or time.time() - self.last_write > self.max_lag
+
+    def stats(self):
+        stats = {}
+        with self._lock:
+            health = dict(self._health)
+        for bind in self.binds:
+            checked_at, healthy, lag = health.get(bind, (None, False, None))
+            stats[bind] = dict(pool_stats(self.db.get_engine(bind=bind)),
+                               healthy=healthy, lag_seconds=lag)
+        return stats
@@ -0,0 +1,149 @@
+from collections import namedtuple
+from datetime import timedelta
+
+from sqlalchemy import literal, select, text, union_all
+
+# A proposed booking of an artist at a venue.
+Slot = namedtuple('Slot', ['venue_id', 'artist_id', 'start_time', 'duration_minutes'])
+
+# The shows overlapping each slot, probing by venue and by artist for every
+# row of the unnested slot arrays. The statement text is the same for any
+# batch, so it costs nothing to build. The period must match the indexed
+# expression (models.SHOW_PERIOD) for Postgres to use the GiST indexes; the
+# start_time bounds, which hold because no show lasts longer than
+# :max_duration, let the btree (venue_id, start_time) and
+# (artist_id, start_time) indexes answer the probes too where the planner
+# prefers them.
+CONFLICTS = text("""
+    SELECT slot.number - 1 AS slot, booked.*
+    FROM unnest(:venue_ids, :artist_ids, :start_times, :end_times) WITH ORDINALITY
+         AS slot (venue_id, artist_id, start_time, end_time, number)
+    CROSS JOIN LATERAL (
+        SELECT 'venue' AS reason, show_id, venue_id, artist_id, start_time,
+               start_time + duration_minutes * interval '1 minute' AS end_time
+        FROM "Show"
+        WHERE venue_id = slot.venue_id AND start_time IS NOT NULL
+          AND start_time BETWEEN slot.start_time - :max_duration AND slot.end_time
+          AND tsrange(start_time, start_time + duration_minutes * interval '1 minute')
+              && tsrange(slot.start_time, slot.end_time)
+        UNION ALL
+        SELECT 'artist', show_id, venue_id, artist_id, start_time,
+               start_time + duration_minutes * interval '1 minute'
+        FROM "Show"
+        WHERE artist_id = slot.artist_id AND start_time IS NOT NULL
+          AND start_time BETWEEN slot.start_time - :max_duration AND slot.end_time
+          AND tsrange(start_time, start_time + duration_minutes * interval '1 minute')
+              && tsrange(slot.start_time, slot.end_time)
+    ) AS booked
+""")
+
+
+class ShowScheduler(object):
+    """Finds the shows a proposed booking would overlap.
+
+    A show occupies its venue and its artist from ``start_time`` for
+    ``duration_minutes``, at most ``max_duration_minutes``. ``conflicts()``
+    checks a batch of slots with a single query of two index probes per
+    slot, one by venue and one by artist, so its cost grows with the number
+    of slots and overlapping shows but only logarithmically with the size
+    of the schedule. Slots of the same batch are also checked against each
+    other. Shows without a start time never conflict.
+
+    The check and the insert that follows it only exclude double bookings
+    when concurrent bookings of the same venue or artist are serialised;
+    ``lock()`` does that by locking both rows until the transaction ends,
+    and ``lock_all()`` does it for the venues and artists of a whole batch.
+    """
+
+    def __init__(self, db, Venue, Artist, max_duration_minutes):
+        self.db = db
+        self.Venue = Venue
+        self.Artist = Artist
+        self.max_duration = timedelta(minutes=max_duration_minutes)
+
+    def lock(self, venue_id, artist_id):
+        """Lock the venue and artist rows; False if either does not exist."""
+        Venue, Artist = self.Venue, self.Artist
+        stmt = select([Venue.id, Artist.id]).where(Venue.id == venue_id).where(
+            Artist.id == artist_id).with_for_update()
+        return self.db.session.execute(stmt).first() is not None
+
+    def lock_all(self, venue_ids, artist_ids):
+        # Rows are locked in id order, so two batches sharing venues or
+        # artists wait for each other instead of deadlocking.
+        for model, ids in ((self.Venue, venue_ids), (self.Artist, artist_ids)):
+            if ids:
+                stmt = select([model.id]).where(model.id.in_(sorted(ids))).order_by(
+                    model.id).with_for_update()
+                self.db.session.execute(stmt).fetchall()
+
+    def unknown(self, slots):
+        """Return, for each slot, errors by field for an id with no row."""
+        Venue, Artist = self.Venue, self.Artist
+        venue_ids = {slot.venue_id for slot in slots}
+        artist_ids = {slot.artist_id for slot in slots}
+        stmt = union_all(
+            select([literal('venue_id'), Venue.id]).where(Venue.id.in_(sorted(venue_ids))),
+            select([literal('artist_id'), Artist.id]).where(Artist.id.in_(sorted(artist_ids))))
+        found = {(key, id) for key, id in self.db.session.execute(stmt)}
+        return [{key: ['No %s with this id.' % key[:-3]]
+                 for key in ('venue_id', 'artist_id') if (key, getattr(slot, key)) not in found}
+                for slot in slots]
+
+    def conflicts(self, slots):
+        """Return, for each slot, the list of bookings it overlaps.
+
+        Each conflict is a dict with the ``reason`` ('venue' or 'artist'),
+        either the ``show_id`` of an existing show or the index of another
+        ``slot`` in the batch, and that booking's venue, artist and times.
+        """
+        results = [[] for _ in slots]
+        if not slots:
+            return results
+        for row in self.db.session.execute(CONFLICTS, self.conflicts_params(slots)):
+            results[row.slot].append({
+                'reason': row.reason, 'show_id': row.show_id, 'venue_id': row.venue_id,
+                'artist_id': row.artist_id, 'start_time': row.start_time, 'end_time': row.end_time,
+            })
+        for reason in ('venue', 'artist'):
+            for index, other in batch_overlaps(slots, reason + '_id'):
+                results[index].append(slot_conflict(reason, other, slots[other]))
+                results[other].append(slot_conflict(reason, index, slots[index]))
+        return results
+
+    def conflicts_params(self, slots):
+        # psycopg2 sends the lists as Postgres arrays.
+        return {
+            'venue_ids': [slot.venue_id for slot in slots],
+            'artist_ids': [slot.artist_id for slot in slots],
+            'start_times': [slot.start_time for slot in slots],
+            'end_times': [end_time(slot) for slot in slots],
+            'max_duration': self.max_duration,
+        }
+
+
+def end_time(slot):
+    return slot.start_time + timedelta(minutes=slot.duration_minutes)
+
+
+def slot_conflict(reason, index, slot):
+    return {'reason': reason, 'slot': index, 'venue_id': slot.venue_id,
+            'artist_id': slot.artist_id, 'start_time': slot.start_time,
+            'end_time': end_time(slot)}
+
+
+def batch_overlaps(slots, key):
+    # Sweep each venue's (or artist's) slots in start order, pairing every
+    # slot with each earlier one that has not ended by the time it starts.
+    groups = {}
+    for index, slot in enumerate(slots):
+        groups.setdefault(getattr(slot, key), []).append(index)
+    for indexes in groups.values():
+        indexes.sort(key=lambda index: slots[index].start_time)
+        active = []
+        for index in indexes:
+            start = slots[index].start_time
+            active = [other for other in active if end_time(slots[other]) > start]
+            for other in active:
+                yield index, other
+            active.append(index)
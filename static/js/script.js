@@ -2,3 +2,22 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// Replace a "Load more" link with the next page of past shows it points to.
+document.addEventListener('click', function (event) {
+  var link = event.target.closest ? event.target.closest('a.load-more') : null;
+  if (!link) {
+    return;
+  }
+  event.preventDefault();
+  var request = new XMLHttpRequest();
+  request.open('GET', link.href);
+  // Asks for the bare fragment instead of a full page.
+  request.setRequestHeader('X-Requested-With', 'XMLHttpRequest');
+  request.onload = function () {
+    if (request.status === 200) {
+      link.parentNode.outerHTML = request.responseText;
+    }
+  };
+  request.send();
+});
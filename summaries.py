@@ -0,0 +1,97 @@
+from datetime import datetime
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+
+
+class ShowSummaries(object):
+    """Maintains the VenueSummary and ArtistSummary tables.
+
+    ``record()`` folds a newly inserted show into the counts of its venue and
+    artist inside the caller's transaction. A show moves from upcoming to past
+    without any write, so ``roll_forward()`` has to run periodically (see the
+    ``flask summaries roll-forward`` command) to recount the entities whose
+    next show has started. ``refresh()`` recounts from the Show table.
+
+    The counts are shown on the pages of the venues and artists they belong
+    to, so when a ``changes`` tracker is given, ``refresh()`` bumps the
+    versions of the Venue and Artist tables: its statements bypass the ORM
+    and would otherwise leave those pages' ETags unchanged.
+    """
+
+    def __init__(self, db, Show, VenueSummary, ArtistSummary, changes=None):
+        self.db = db
+        self.Show = Show
+        self.changes = changes
+        self.targets = [
+            (VenueSummary, VenueSummary.venue_id, Show.venue_id),
+            (ArtistSummary, ArtistSummary.artist_id, Show.artist_id),
+        ]
+        # The tables the summarised venue_id and artist_id refer to.
+        self.owners = [next(iter(show_key.property.columns[0].foreign_keys)).column.table.name
+                       for summary, key, show_key in self.targets]
+
+    def record(self, show, now=None):
+        now = now or datetime.now()
+        upcoming = show.start_time > now
+        for summary, key, show_key in self.targets:
+            table = summary.__table__
+            stmt = insert(table).values({
+                key.key: getattr(show, show_key.key),
+                'upcoming_shows_count': int(upcoming),
+                'past_shows_count': int(not upcoming),
+                'next_show_time': show.start_time if upcoming else None,
+            })
+            stmt = stmt.on_conflict_do_update(index_elements=[key.key], set_={
+                'upcoming_shows_count': table.c.upcoming_shows_count + int(upcoming),
+                'past_shows_count': table.c.past_shows_count + int(not upcoming),
+                # least() ignores NULLs, so this keeps the earliest upcoming show.
+                'next_show_time': func.least(table.c.next_show_time,
+                                             stmt.excluded.next_show_time),
+            })
+            self.db.session.execute(stmt)
+
+    def refresh(self, venue_ids=None, artist_ids=None, now=None):
+        # Recount the given venues and artists, or all of them when no ids
+        # are passed.
+        now = now or datetime.now()
+        Show = self.Show
+        recounted = []
+        for (summary, key, show_key), owner, ids in zip(self.targets, self.owners,
+                                                        (venue_ids, artist_ids)):
+            if ids is not None and not ids:
+                continue
+            recounted.append(owner)
+            table = summary.__table__
+            reset = table.update().values(upcoming_shows_count=0, past_shows_count=0,
+                                          next_show_time=None)
+            counts = select([
+                show_key,
+                func.count(Show.show_id).filter(Show.start_time > now),
+                func.count(Show.show_id).filter(Show.start_time <= now),
+                func.min(Show.start_time).filter(Show.start_time > now),
+            ]).group_by(show_key)
+            if ids is not None:
+                reset = reset.where(key.in_(ids))
+                counts = counts.where(show_key.in_(ids))
+            stmt = insert(table).from_select(
+                [key.key, 'upcoming_shows_count', 'past_shows_count', 'next_show_time'], counts)
+            stmt = stmt.on_conflict_do_update(index_elements=[key.key], set_={
+                'upcoming_shows_count': stmt.excluded.upcoming_shows_count,
+                'past_shows_count': stmt.excluded.past_shows_count,
+                'next_show_time': stmt.excluded.next_show_time,
+            })
+            self.db.session.execute(reset)
+            self.db.session.execute(stmt)
+        if self.changes is not None and recounted:
+            self.changes.bump(self.db.session, recounted)
+
+    def roll_forward(self, now=None):
+        # Recount only the venues and artists whose next show has started.
+        now = now or datetime.now()
+        stale = []
+        for summary, key, show_key in self.targets:
+            rows = self.db.session.query(key).filter(summary.next_show_time <= now).all()
+            stale.append([row[0] for row in rows])
+        self.refresh(*stale, now=now)
+        return stale
@@ -0,0 +1,109 @@
+"""Fixtures for the tests, which run the app against a real database.
+
+They use the database in TEST_DATABASE_URL, which must be migrated to the
+latest revision, and are skipped when it is not set; DATABASE_URL is never
+used, so they cannot touch the development or production data. Everything
+a test module writes, through its requests or its own fixtures, is rolled
+back at the end, so the database is left as it was.
+"""
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
+
+import config
+from app import create_app, page_cache
+from models import db
+
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+
+
+@pytest.fixture(scope='session')
+def test_config():
+  # The settings of config.py against the test database, without replicas.
+  if not TEST_DATABASE_URL:
+    pytest.skip('TEST_DATABASE_URL is not set')
+  settings = {name: value for name, value in vars(config).items() if name.isupper()}
+  settings.update(SQLALCHEMY_DATABASE_URI=TEST_DATABASE_URL, SQLALCHEMY_BINDS={},
+                  REPLICA_URLS=[], REPLICA_BINDS=[])
+  return SimpleNamespace(**settings)
+
+
+@pytest.fixture(scope='session')
+def app(test_config):
+  return create_app(test_config)
+
+
+@pytest.fixture(scope='module')
+def database(app):
+  """Join every session to one outer transaction and roll it back after.
+
+  Sessions work inside a SAVEPOINT that is opened again whenever it ends,
+  so a view's commit or rollback only ever ends the SAVEPOINT and never
+  the outer transaction (SQLAlchemy 1.3's recipe for joining a session
+  into an external transaction). Views also close their session; the next
+  one opens its own SAVEPOINT as soon as it uses the connection.
+  """
+  def begin_savepoint(session, transaction, connection):
+    if transaction._parent is None:
+      session.begin_nested()
+
+  def restart_savepoint(session, transaction):
+    if transaction.nested and not transaction._parent.nested:
+      session.expire_all()
+      session.begin_nested()
+
+  with app.app_context():
+    connection = db.engine.connect()
+    outer = connection.begin()
+    options = dict(db.session.session_factory.kw)
+    db.session.remove()
+    db.session.configure(bind=connection, binds={})
+    event.listen(db.session, 'after_begin', begin_savepoint)
+    event.listen(db.session, 'after_transaction_end', restart_savepoint)
+    try:
+      yield db
+    finally:
+      event.remove(db.session, 'after_begin', begin_savepoint)
+      event.remove(db.session, 'after_transaction_end', restart_savepoint)
+      db.session.remove()
+      db.session.session_factory.kw.clear()
+      db.session.session_factory.kw.update(options)
+      outer.rollback()
+      connection.close()
+
+
+class StatementCounter(object):
+  """Counts the SQL statements executed, leaving out the SAVEPOINTs of the
+  ``database`` fixture."""
+
+  def __init__(self):
+    self.count = 0
+
+  def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+    if not statement.startswith(('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')):
+      self.count += 1
+
+  def request(self, client, method, path, data=None):
+    # The statements of one request, with the page cache emptied first so
+    # the full rendering path runs.
+    for kind in ('venue', 'artist', 'shows'):
+      page_cache.invalidate(kind)
+    self.count = 0
+    response = client.open(path, method=method, data=data)
+    response.get_data()
+    return response, self.count
+
+
+@pytest.fixture(scope='module')
+def statements():
+  counter = StatementCounter()
+  event.listen(Engine, 'before_cursor_execute', counter.before_cursor_execute)
+  yield counter
+  event.remove(Engine, 'before_cursor_execute', counter.before_cursor_execute)
@@ -0,0 +1,74 @@
+"""The calendar API of the async serving mode (async_app.py), which builds
+its page links with Quart's url_for."""
+import asyncio
+import json
+from datetime import date, datetime, timedelta
+from urllib.parse import urlencode
+
+import pytest
+
+import async_app
+from asyncdb import AsyncDatabase
+from models import Artist, Show, Venue, db
+
+
+@pytest.fixture(scope='module')
+def calendar(app):
+  # The async mode reads through its own asyncpg pool, which cannot see the
+  # rolled back transaction of the `database` fixture, so these shows are
+  # committed and deleted again afterwards.
+  start = datetime.combine(date.today(), datetime.min.time()) + timedelta(days=30)
+  shows = app.config['LISTING_PAGE_SIZE'] + 1
+  with app.app_context():
+    venue = Venue(name='Calendar test venue', city='Calendar Test City', state='CA',
+                  genres=['Jazz'])
+    artist = Artist(name='Calendar test artist', city='Calendar Test City', state='CA',
+                    genres=['Jazz'])
+    db.session.add_all([venue, artist])
+    db.session.flush()
+    db.session.add_all([Show(venue_id=venue.id, artist_id=artist.id,
+                             start_time=start + timedelta(hours=3 * number), duration_minutes=120)
+                        for number in range(shows)])
+    db.session.commit()
+    ids = venue.id, artist.id
+    db.session.remove()
+  yield {'city': 'Calendar Test City', 'start': start.date().isoformat(),
+         'end': (start + timedelta(days=7)).date().isoformat()}, shows
+  with app.app_context():
+    for show in Show.query.filter_by(venue_id=ids[0]):
+      db.session.delete(show)
+    db.session.flush()
+    db.session.delete(Venue.query.get(ids[0]))
+    db.session.delete(Artist.query.get(ids[1]))
+    db.session.commit()
+    db.session.remove()
+
+
+async def calendar_pages(app, args):
+  # Every page of the calendar API, following the `next` links, read with
+  # the app context and a pool of the test database rather than config.py's.
+  database = AsyncDatabase(app.config['SQLALCHEMY_DATABASE_URI'])
+  database, async_app.database = async_app.database, database
+  try:
+    with app.app_context():
+      await async_app.database.connect()
+      client = async_app.app.test_client()
+      pages = []
+      path = '/api/v1/shows/calendar?' + urlencode(args)
+      while path:
+        response = await client.get(path)
+        assert response.status_code == 200
+        pages.append(json.loads(await response.get_data()))
+        path = pages[-1]['next']
+      return pages
+  finally:
+    await async_app.database.close()
+    async_app.database = database
+
+
+def test_calendar_pages(app, calendar):
+  args, shows = calendar
+  pages = asyncio.run(calendar_pages(app, args))
+  assert len(pages) == 2
+  assert sum(len(page['data']) for page in pages) == shows
+  assert sum(day['shows'] for day in pages[0]['days']) == shows
@@ -0,0 +1,38 @@
+import base64
+import json
+from datetime import datetime
+
+import pytest
+from werkzeug.exceptions import BadRequest
+
+from models import Show, Venue
+from pagination import decode_cursor, encode_cursor
+
+VENUE_KEYS = [Venue.name, Venue.id]
+SHOW_KEYS = [Show.start_time, Show.show_id]
+
+
+def cursor(values):
+  return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def test_cursor_round_trip():
+  row = Show(start_time=datetime(2021, 1, 2, 20, 30), show_id=7)
+  assert decode_cursor(SHOW_KEYS, encode_cursor(SHOW_KEYS, row)) == [row.start_time, 7]
+
+
+@pytest.mark.parametrize('keys, values', [
+  (VENUE_KEYS, ['The Musical Hop', '1']),
+  (VENUE_KEYS, ['The Musical Hop', [1]]),
+  (VENUE_KEYS, ['The Musical Hop', True]),
+  (VENUE_KEYS, [{'name': 'x'}, 1]),
+  (VENUE_KEYS, {'name': 'x', 'id': 1}),
+  (VENUE_KEYS, ['The Musical Hop']),
+  (SHOW_KEYS, [20210102, 7]),
+  (SHOW_KEYS, ['not a time', 7]),
+  (SHOW_KEYS, ['2021-01-02T20:30:00+02:00', 7]),
+  (SHOW_KEYS, ['2021-01-02T20:30:00', 7.5]),
+])
+def test_mistyped_cursor_is_a_bad_request(keys, values):
+  with pytest.raises(BadRequest):
+    decode_cursor(keys, cursor(values))
@@ -0,0 +1,123 @@
+"""Check the number of SQL statements each route of app.py executes.
+
+Requests every route (the same requests as benchmarks/load_test.py, writes
+included) against a small and then a large synthetic dataset and counts
+the statements each request executes. A route fails when its count grows
+with the data, which is how N+1 query patterns show up, or exceeds its
+budget in QUERY_BUDGETS. Routes without a budget fail too, so new routes
+have to declare one.
+"""
+import random
+
+import pytest
+from sqlalchemy import text
+
+from app import assets
+from load_test import Traffic, read_routes, write_routes
+from seed import seed
+
+# Most statements a single request of each endpoint may execute.
+QUERY_BUDGETS = {
+  'index': 0,
+  'static': 0,
+  'asset_bundle': 0,
+  'venues': 2,
+  'artists': 2,
+  'shows': 2,
+  'browse_shows': 2,
+  'calendar_shows': 3,
+  'api_calendar_shows': 3,
+  'search_venues': 1,
+  'search_artists': 1,
+  'show_venue': 3,
+  'show_artist': 3,
+  'venue_past_shows': 2,
+  'artist_past_shows': 2,
+  'api_venue': 3,
+  'api_artist': 3,
+  'api_shows': 2,
+  'api_venue_past_shows': 2,
+  'api_artist_past_shows': 2,
+  'check_show_conflicts': 2,
+  'edit_venue': 1,
+  'edit_artist': 1,
+  'create_venue_form': 0,
+  'create_artist_form': 0,
+  'create_shows': 0,
+  'export': 1,
+  'cache_stats': 0,
+  'prometheus_metrics': 0,
+  'connection_pool_stats': 0,
+  'create_venue_submission': 2,
+  'create_artist_submission': 2,
+  'create_show_submission': 6,
+  'edit_venue_submission': 3,
+  'edit_artist_submission': 3,
+  'delete_venue': 5,
+  'delete_artist': 5,
+}
+
+DATASETS = [
+  ('small', {'venues': 20, 'artists': 40, 'shows': 400}),
+  ('large', {'venues': 1000, 'artists': 2000, 'shows': 50000}),
+]
+
+# Requests per route and dataset, with different ids.
+SAMPLES = 5
+
+
+def random_for(endpoint, number):
+  return random.Random('%s-%d' % (endpoint, number))
+
+
+def count_statements(app, statements, routes):
+  # The most statements any sampled request of each route executed.
+  counts = {}
+  for endpoint, (weight, build) in sorted(routes.items()):
+    for number in range(SAMPLES):
+      request = build(random_for(endpoint, number))
+      if request is None:
+        continue
+      method, path, data = request
+      response, count = statements.request(app.test_client(), method, path, data)
+      assert response.status_code < 400, '%s %s returned %d' % (
+        method, path, response.status_code)
+      counts[endpoint] = max(counts.get(endpoint, 0), count)
+  return counts
+
+
+@pytest.fixture(scope='module')
+def built_assets(app, tmp_path_factory):
+  # Bundles for asset_bundle to send, built outside the static folder.
+  dist, manifest = assets.dist, assets.manifest
+  assets.dist = str(tmp_path_factory.mktemp('dist'))
+  assets.build()
+  yield assets
+  assets.dist, assets.manifest = dist, manifest
+
+
+@pytest.fixture(scope='module')
+def counts(app, built_assets, database, statements):
+  database.session.execute(text('TRUNCATE "Show", "Venue", "Artist", "VenueSummary", '
+                                '"ArtistSummary" RESTART IDENTITY CASCADE'))
+  results = {}
+  for name, sizes in DATASETS:
+    seed(sizes['venues'], sizes['artists'], sizes['shows'], random_seed=0.5)
+    traffic = Traffic(app, hot=10, writes=True, deletable=SAMPLES)
+    routes = read_routes(traffic)
+    routes.update(write_routes(traffic))
+    results[name] = count_statements(app, statements, routes)
+  return results
+
+
+def test_every_route_has_a_budget(app):
+  assert sorted(set(app.view_functions) - set(QUERY_BUDGETS)) == []
+
+
+@pytest.mark.parametrize('endpoint', sorted(QUERY_BUDGETS))
+def test_query_budget(counts, endpoint):
+  small, large = counts['small'].get(endpoint), counts['large'].get(endpoint)
+  assert small is not None and large is not None, 'not requested'
+  assert large <= small, 'grows with data: %d statements, then %d' % (small, large)
+  assert max(small, large) <= QUERY_BUDGETS[endpoint], 'over budget: %d statements, budget %d' % (
+    max(small, large), QUERY_BUDGETS[endpoint])
@@ -0,0 +1,61 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import Artist, Show, Venue
+
+
+@pytest.fixture(scope='module')
+def booking(database):
+  venue = Venue(name='Conflict test venue', city='Nowhere', state='CA', genres=['Jazz'])
+  artist = Artist(name='Conflict test artist', city='Nowhere', state='CA', genres=['Jazz'])
+  database.session.add_all([venue, artist])
+  database.session.flush()
+  start = datetime.now().replace(microsecond=0) + timedelta(days=30)
+  database.session.add(Show(venue_id=venue.id, artist_id=artist.id, start_time=start,
+                            duration_minutes=120))
+  database.session.commit()
+  return venue.id, artist.id, start
+
+
+def check(app, *slots):
+  return app.test_client().post('/api/v1/shows/conflicts', data=json.dumps({'slots': [
+    {'venue_id': venue_id, 'artist_id': artist_id, 'start_time': start_time}
+    for venue_id, artist_id, start_time in slots]}))
+
+
+def test_overlaps_are_reported(app, booking):
+  venue_id, artist_id, start = booking
+  later = start + timedelta(days=1)
+  response = check(app, (venue_id, artist_id, (start + timedelta(hours=1)).isoformat()),
+                   (venue_id, artist_id, later.isoformat()),
+                   (venue_id, artist_id, (later + timedelta(hours=1)).isoformat()))
+  assert response.status_code == 200
+  results = response.get_json()['results']
+  assert [result['available'] for result in results] == [False, False, False]
+  assert {conflict['reason'] for conflict in results[0]['conflicts']} == {'venue', 'artist'}
+  assert {conflict.get('slot') for conflict in results[1]['conflicts']} == {2}
+
+
+def test_unknown_venue_or_artist_is_invalid(app, booking):
+  venue_id, artist_id, start = booking
+  free = start + timedelta(days=2)
+  results = check(app, (0, artist_id, free.isoformat()),
+                  (venue_id, artist_id, free.isoformat()),
+                  (venue_id, 0, (free + timedelta(hours=1)).isoformat()),
+                  (venue_id, artist_id, (free + timedelta(days=1)).isoformat()),
+                  (venue_id, artist_id, (free + timedelta(days=1, hours=1)).isoformat())
+                  ).get_json()['results']
+  assert [list(result['errors']) for result in results] == [
+    ['venue_id'], [], ['artist_id'], [], []]
+  assert results[1] == {'slot': 1, 'available': True, 'conflicts': [], 'errors': {}}
+  assert results[2]['available'] is False and results[2]['conflicts'] == []
+  # Other slots are numbered as in the request.
+  assert [conflict['slot'] for conflict in results[3]['conflicts']] == [4, 4]
+
+
+@pytest.mark.parametrize('start_time', ['2030-05-01T20:00:00+02:00', '2030-05-01T20:00:00Z'])
+def test_start_time_with_time_zone_is_a_bad_request(app, booking, start_time):
+  venue_id, artist_id, start = booking
+  assert check(app, (venue_id, artist_id, start_time)).status_code == 400
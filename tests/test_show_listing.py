@@ -0,0 +1,33 @@
+"""The show listings run a fixed number of statements however many shows
+there are: each page is read with one query, joined to its venues and
+artists, instead of one query per show."""
+import pytest
+from sqlalchemy import text
+
+from seed import seed
+
+PATHS = ['/shows', '/api/v1/shows', '/shows/browse?genre=Jazz']
+
+
+@pytest.fixture(scope='module')
+def counts(app, database, statements):
+  # Statements per path with a few shows, then with a hundred times more.
+  database.session.execute(text('TRUNCATE "Show", "Venue", "Artist", "VenueSummary", '
+                                '"ArtistSummary" RESTART IDENTITY CASCADE'))
+  results = []
+  for venues, artists, shows in [(5, 10, 50), (200, 400, 5000)]:
+    seed(venues, artists, shows, random_seed=0.5)
+    client = app.test_client()
+    counts = {}
+    for path in PATHS:
+      response, counts[path] = statements.request(client, 'GET', path)
+      assert response.status_code == 200
+    results.append(counts)
+  return results
+
+
+@pytest.mark.parametrize('path', PATHS)
+def test_statements_do_not_grow_with_shows(counts, path):
+  few, many = counts
+  assert few[path] == many[path]
+  assert many[path] <= 2
@@ -0,0 +1,7 @@
+from app import create_app, preload
+
+# Entry point of the production server: `gunicorn wsgi:app`, configured by
+# gunicorn.conf.py. With preload_app, gunicorn imports this module once in
+# its master, so the workers it forks share the preloaded app.
+app = create_app()
+preload(app)